@@ -3,36 +3,67 @@ from flask import Flask
 from flask_socketio import SocketIO
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
+from app.services.db_routing import RoutingSession, REPLICA_BIND, enable_sqlite_wal
 
 # Initialize Flask extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 socketio = SocketIO()
 login_manager = LoginManager()
-migrate = Migrate()
 
 def create_app(config=None):
     app = Flask(__name__)
     
-    # Load default configuration
-    app.config.from_object('app.config.Config')
-    
-    # Load environment variables
+    # Load environment variables before the config reads them
     if os.path.exists('.env'):
         from dotenv import load_dotenv
         load_dotenv()
     
-    # Override config with passed config object
+    # Load default configuration, picked from FLASK_ENV at app creation
+    from app.config import get_config
+    app.config.from_object(get_config())
+    
+    # Override config with passed config object or config name
+    if isinstance(config, str):
+        config = get_config(config)
     if config:
         app.config.from_object(config)
     
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
+    
+    # Flask-Migrate pulls in Alembic, only load it where migrations run
+    if app.config['MIGRATE_ENABLED']:
+        from flask_migrate import Migrate
+        Migrate(app, db)
     
     # Initialize SocketIO with CORS support
     socketio.init_app(app, cors_allowed_origins="*")
     
+    # Run password hashing and thumbnails in OS threads, off the event loop
+    from app.services.offload import hash_pool, thumbnail_pool
+    hash_pool.init_app(app, 'HASH_CONCURRENCY')
+    thumbnail_pool.init_app(app, 'THUMBNAIL_CONCURRENCY')
+    
+    # Load Socket.IO rate limits
+    from app.services.ratelimit import rate_limiter
+    rate_limiter.init_app(app)
+    
+    # Size the rendered fragment cache
+    from app.services.fragment_cache import fragment_cache
+    fragment_cache.init_app(app)
+    
+    # Compress large JSON responses
+    from app.services.http_cache import compressor
+    compressor.init_app(app)
+    
+    # Assign rooms to Socket.IO workers
+    from app.services.sharding import shard_router
+    shard_router.init_app(app)
+    
+    # Time handlers and watch for event loop stalls
+    from app.services.loop_monitor import loop_monitor
+    loop_monitor.init_app(app)
+    
     # Configure login
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
@@ -42,16 +73,66 @@ def create_app(config=None):
     from app.routes.auth import auth_bp
     from app.routes.chat import chat_bp
     from app.routes.admin import admin_bp
+    from app.routes.media import media_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(chat_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(media_bp)
     
     # Import Socket.IO events
     from app.sockets import events
     
-    # Create database tables
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
+    if app.config['LOOP_MONITOR_ENABLED']:
+        loop_monitor.instrument(app)
+    
     with app.app_context():
-        db.create_all()
+        # Create database tables, unless the schema is managed by migrations
+        if app.config['AUTO_CREATE_TABLES']:
+            db.create_all()
+        
+        # Let replica connections read consistent snapshots while we write
+        if REPLICA_BIND in app.config.get('SQLALCHEMY_BINDS', {}):
+            enable_sqlite_wal(db.engine)
+    
+    return app
+
+def start_workers(app):
+    """Start the background workers, only server entrypoints call this, not CLI commands"""
+    from app.services.periodic import start_periodic
+    from app.services.read_markers import flush
+    from app.services.jobs import requeue_stale, run_pending
+    from app.services.changes import compact
+    from app.services.archive import run_retention
+    from app.services.sharding import shard_router
+    from app.services.loop_monitor import loop_monitor
+    config = app.config
+    
+    # Write buffered read markers in batches
+    start_periodic(app, 'Read marker flush', config['READ_MARKER_FLUSH_INTERVAL'], flush)
+    
+    # Run background jobs queued in the jobs table, taking over those a dead worker left
+    with app.app_context():
+        requeue_stale(app)
+    start_periodic(app, 'Job worker', config['JOB_POLL_INTERVAL'], lambda: run_pending(app))
+    
+    # Follow worker list changes made on any worker
+    if shard_router.self_url:
+        start_periodic(app, 'Shard worker reload', config['SHARD_RELOAD_INTERVAL'],
+                       lambda: shard_router.reload(app))
+    
+    # Measure event loop lag
+    if config['LOOP_MONITOR_ENABLED']:
+        loop_monitor.start()
+    
+    # Keep the sync change log bounded
+    start_periodic(app, 'Change log compaction', config['CHANGE_LOG_COMPACT_INTERVAL'],
+                   lambda: compact(app))
     
-    return app
\ No newline at end of file
+    # Periodically move old messages to cold storage
+    if config['ARCHIVE_INTERVAL']:
+        start_periodic(app, 'Retention run', config['ARCHIVE_INTERVAL'], lambda: run_retention(app))
@@ -0,0 +1,259 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app.services.archive import run_retention
+from app.services.transfer import export_ndjson, import_ndjson
+from app.services.seed import generate_dataset
+from app.services.offload import hash_pool
+from app.services.passwords import hash_password, verify_password
+from app.services.query_plans import check_query_plans
+from app.services.jobs import requeue_stale, run_pending
+from app.services.changes import compact
+from app import db, socketio
+
+def register_commands(app):
+    """Register the maintenance commands with the flask CLI"""
+    app.cli.add_command(archive_messages)
+    app.cli.add_command(export_data)
+    app.cli.add_command(import_data)
+    app.cli.add_command(seed_perf)
+    app.cli.add_command(bench_startup)
+    app.cli.add_command(bench_hashing)
+    app.cli.add_command(bench_export)
+    app.cli.add_command(check_plans)
+    app.cli.add_command(run_jobs)
+    app.cli.add_command(compact_changes)
+
+@click.command('archive-messages')
+@with_appcontext
+def archive_messages():
+    """Move messages past their retention window into archive segments."""
+    result = run_retention(current_app)
+    if result['skipped']:
+        raise click.ClickException('Another process is running retention, try again later')
+    click.echo(f"Archived {result['archived']} messages, purged {result['purged']} deleted messages")
+
+@click.command('run-jobs')
+@with_appcontext
+def run_jobs():
+    """Run pending background jobs now instead of waiting for the worker."""
+    requeue_stale(current_app)
+    ran = run_pending(current_app)
+    click.echo(f'Ran {ran} jobs')
+
+@click.command('compact-changes')
+@with_appcontext
+def compact_changes():
+    """Compact the sync change log now instead of waiting for the worker."""
+    result = compact(current_app)
+    click.echo(f"Dropped {result['superseded']} superseded and {result['dropped']} expired changes")
+
+@click.command('export-data')
+@with_appcontext
+@click.argument('path', default='-')
+@click.option('--batch-size', default=1000, help='Rows fetched per database round trip.')
+def export_data(path, batch_size):
+    """Export users, rooms, memberships and messages as NDJSON."""
+    started = time.perf_counter()
+    if path == '-':
+        rows = export_ndjson(sys.stdout, batch_size)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            rows = export_ndjson(f, batch_size)
+    _report('Exported', rows, started)
+
+@click.command('import-data')
+@with_appcontext
+@click.argument('path')
+@click.option('--batch-size', default=5000, help='Rows inserted per executemany batch.')
+@click.option('--no-resume', is_flag=True, help='Ignore an existing checkpoint.')
+def import_data(path, batch_size, no_resume):
+    """Import an NDJSON export, resuming from its checkpoint if present."""
+    started = time.perf_counter()
+    rows = import_ndjson(path, batch_size, resume=not no_resume)
+    _report('Imported', rows, started)
+
+@click.command('seed-perf')
+@with_appcontext
+@click.option('--users', default=1000, help='Number of users.')
+@click.option('--rooms', default=100, help='Number of rooms.')
+@click.option('--messages', default=100000, help='Number of messages.')
+@click.option('--private-ratio', default=0.2, help='Share of private rooms.')
+@click.option('--rooms-per-user', default=5, help='Rooms each user joins.')
+@click.option('--reply-ratio', default=0.15, help='Share of messages that are replies.')
+@click.option('--deleted-ratio', default=0.02, help='Share of soft-deleted messages.')
+@click.option('--days', default=365, help='Days of history to spread messages over.')
+@click.option('--seed', default=42, help='Random seed, same seed gives the same data.')
+@click.option('--batch-size', default=10000, help='Rows inserted per executemany batch.')
+def seed_perf(users, rooms, messages, private_ratio, rooms_per_user, reply_ratio,
+              deleted_ratio, days, seed, batch_size):
+    """Generate a synthetic dataset for performance testing."""
+    started = time.perf_counter()
+    result = generate_dataset(
+        users=users, rooms=rooms, messages=messages, private_ratio=private_ratio,
+        rooms_per_user=rooms_per_user, reply_ratio=reply_ratio,
+        deleted_ratio=deleted_ratio, days=days, seed=seed, batch_size=batch_size,
+        max_length=current_app.config['MAX_MESSAGE_LENGTH'],
+        report=lambda done: click.echo(f'  {done} messages', err=True)
+    )
+    click.echo(f"Seeded {result['users']} users, {result['rooms']} rooms "
+               f"({result['private_rooms']} private)", err=True)
+    _report('Inserted', result['messages'], started)
+
+# Runs in a fresh interpreter so nothing is already imported
+STARTUP_SCRIPT = '''
+import time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app({config!r})
+print(imported - started, time.perf_counter() - imported)
+'''
+
+@click.command('bench-startup')
+@with_appcontext
+@click.option('--config', 'config_name', default='production', help='Config name to build the app with.')
+@click.option('--runs', default=5, help='Number of cold starts to average.')
+@click.option('--top', default=10, help='Slowest top-level imports to list.')
+@click.option('--max-ms', type=float, help='Fail if the average cold start is slower than this.')
+def bench_startup(config_name, runs, top, max_ms):
+    """Measure app factory cold start with python -X importtime."""
+    root = os.path.dirname(current_app.root_path)
+    script = STARTUP_SCRIPT.format(config=config_name)
+    totals = []
+    imports = {}
+
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', script],
+                              cwd=root, capture_output=True, text=True, check=True)
+        import_s, factory_s = map(float, proc.stdout.split()[-2:])
+        totals.append((import_s, factory_s))
+
+        # Lines look like 'import time: self | cumulative | name', nesting is indented
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit() and not name.startswith('  '):
+                imports[name.strip()] = imports.get(name.strip(), 0) + int(cumulative)
+
+    import_ms = sum(t[0] for t in totals) / runs * 1000
+    factory_ms = sum(t[1] for t in totals) / runs * 1000
+    click.echo(f'Imports: {import_ms:.1f}ms  create_app: {factory_ms:.1f}ms  '
+               f'total: {import_ms + factory_ms:.1f}ms (mean of {runs})')
+
+    click.echo('Slowest top-level imports:')
+    for name, micros in sorted(imports.items(), key=lambda i: i[1], reverse=True)[:top]:
+        click.echo(f'  {micros / runs / 1000:8.1f}ms  {name}')
+
+    if max_ms is not None and import_ms + factory_ms > max_ms:
+        raise click.ClickException(f'Cold start exceeds {max_ms:.0f}ms')
+
+@click.command('bench-hashing')
+@with_appcontext
+@click.option('--logins', default=100, help='Concurrent password checks to run.')
+@click.option('--interval', default=10, help='Probe interval in milliseconds.')
+@click.option('--inline', is_flag=True, help='Hash on the event loop instead of the pool.')
+def bench_hashing(logins, interval, inline):
+    """Measure event loop latency while a burst of logins is hashed."""
+    from werkzeug.security import check_password_hash
+    password_hash = hash_password('benchmark-password')
+    check = check_password_hash if inline else verify_password
+    app = current_app._get_current_object()
+    lags = []
+    done = []
+
+    def login():
+        with app.app_context():
+            check(password_hash, 'benchmark-password')
+        done.append(1)
+
+    # Stands in for a message broadcast, measures how late it gets to run
+    def probe():
+        while True:
+            started = time.perf_counter()
+            socketio.sleep(interval / 1000)
+            lags.append((time.perf_counter() - started) * 1000 - interval)
+            if len(done) == logins:
+                break
+
+    started = time.perf_counter()
+    socketio.start_background_task(probe)
+    for _ in range(logins):
+        socketio.start_background_task(login)
+    while len(done) < logins:
+        socketio.sleep(interval / 1000)
+    elapsed = time.perf_counter() - started
+    socketio.sleep(interval / 1000 * 2)  # let the probe take its last sample
+
+    lags.sort()
+    mode = 'inline' if inline else f'{socketio.async_mode} pool of {hash_pool.limit}'
+    click.echo(f'{logins} logins hashed in {elapsed:.2f}s ({mode})')
+    if lags:
+        click.echo(f'Loop lag p50: {lags[len(lags) // 2]:.1f}ms  '
+                   f'p99: {lags[int(len(lags) * 0.99)]:.1f}ms  max: {lags[-1]:.1f}ms')
+    click.echo(f'Pool: {hash_pool.stats()}')
+
+@click.command('bench-export')
+@with_appcontext
+@click.option('--target', help='Empty database to import into, a fresh SQLite file by default.')
+@click.option('--export-batch-size', default=1000, help='Rows fetched per database round trip.')
+@click.option('--import-batch-size', default=5000, help='Rows inserted per executemany batch.')
+@click.option('--keep', is_flag=True, help='Keep the export file and scratch database.')
+def bench_export(target, export_batch_size, import_batch_size, keep):
+    """Measure export and import throughput on the current dataset, run after seed-perf."""
+    workdir = tempfile.mkdtemp(prefix='jacario-bench-')
+    path = os.path.join(workdir, 'export.ndjson')
+    target = target or 'sqlite:///' + os.path.join(workdir, 'import.db')
+
+    started = time.perf_counter()
+    with open(path, 'w', encoding='utf-8') as f:
+        rows = export_ndjson(f, export_batch_size)
+    _report('Exported', rows, started)
+    click.echo(f'Export file is {os.path.getsize(path) / 2**20:,.1f} MiB', err=True)
+
+    # Imports in a fresh process bound to the target, it reports its own rate
+    env = dict(os.environ, DATABASE_URL=target, AUTO_CREATE_TABLES='True')
+    env.pop('DATABASE_REPLICA_URL', None)
+    root = os.path.dirname(current_app.root_path)
+    proc = subprocess.run([sys.executable, '-m', 'flask', 'import-data', path, '--no-resume',
+                           '--batch-size', str(import_batch_size)], cwd=root, env=env)
+    if proc.returncode:
+        raise click.ClickException(f'Import failed, files kept in {workdir}')
+
+    if keep:
+        click.echo(f'Kept {workdir}', err=True)
+    else:
+        shutil.rmtree(workdir)
+
+@click.command('check-query-plans')
+@with_appcontext
+@click.option('--verbose', is_flag=True, help='Print the plan of every query.')
+def check_plans(verbose):
+    """Fail if a hot query needs a full table scan (SQLite)."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('EXPLAIN QUERY PLAN checks need a SQLite database')
+
+    failed = []
+    for name, (plan, scans) in check_query_plans().items():
+        status = 'FULL SCAN' if scans else 'ok'
+        click.echo(f'{status:9}  {name}')
+        if verbose or scans:
+            for line in plan:
+                click.echo(f'             {line}')
+        if scans:
+            failed.append(name)
+
+    if failed:
+        raise click.ClickException(f'{len(failed)} hot queries scan a whole table')
+
+def _report(action, rows, started):
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed else 0
+    click.echo(f'{action} {rows} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)', err=True)
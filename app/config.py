@@ -9,11 +9,89 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///jacario.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Startup: create tables on boot, or leave the schema to `flask db upgrade`
+    AUTO_CREATE_TABLES = os.environ.get('AUTO_CREATE_TABLES', 'True') == 'True'
+    # Flask-Migrate pulls in Alembic, workers that never migrate can skip it
+    MIGRATE_ENABLED = os.environ.get('MIGRATE_ENABLED', 'True') == 'True'
+    
+    # Optional read replica for read-only handlers, e.g. a second
+    # read-only SQLite connection: sqlite:///file:jacario.db?mode=ro&uri=true
+    SQLALCHEMY_BINDS = ({'replica': os.environ['DATABASE_REPLICA_URL']}
+                        if os.environ.get('DATABASE_REPLICA_URL') else {})
+    
+    # Password hashing, hashes with other parameters are upgraded on login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    HASH_CONCURRENCY = int(os.environ.get('HASH_CONCURRENCY', 4))
+    
+    # Socket.IO rate limits per event and scope: (tokens per second, burst)
+    RATE_LIMITS = {
+        'send_message': {'user': (1, 5), 'sid': (1, 5), 'room': (20, 50)},
+        'typing_start': {'user': (2, 5), 'sid': (2, 5)},
+        'edit_message': {'user': (0.5, 3), 'sid': (0.5, 3)}
+    }
+    
+    # Read markers are buffered and written in batches this often (seconds)
+    READ_MARKER_FLUSH_INTERVAL = 5
+    
+    # Rendered sidebar and history fragments
+    FRAGMENT_CACHE_SIZE = 1024
+    FRAGMENT_CACHE_TTL = 60  # seconds
+    
+    # JSON responses at least this many bytes are gzip/brotli compressed
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_CACHE_SIZE = 256
+    
+    # Background jobs (room deletion, bulk moderation)
+    JOB_BATCH_SIZE = 1000
+    JOB_POLL_INTERVAL = 2  # seconds
+    JOB_STALE_AFTER = 600  # seconds without progress before a running job is requeued
+    
+    # Media uploads, stored by content hash
+    MEDIA_DIR = os.environ.get('MEDIA_DIR', 'media')
+    MAX_UPLOAD_SIZE = 25 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE = 64 * 1024
+    THUMBNAIL_SIZE = (320, 320)
+    # Larger images are not decoded, a small compressed file can expand to gigabytes
+    THUMBNAIL_MAX_PIXELS = 50_000_000
+    THUMBNAIL_CONCURRENCY = 2
+    
+    # Event loop lag monitor: a stall past the threshold logs the blocking stack
+    LOOP_MONITOR_ENABLED = os.environ.get('LOOP_MONITOR_ENABLED', 'True') == 'True'
+    LOOP_MONITOR_INTERVAL = 0.5  # seconds
+    LOOP_LAG_THRESHOLD_MS = 100
+    SLOW_HANDLER_MS = 250
+    
+    # Edit history kept per message, older revisions are compacted away
+    MESSAGE_REVISION_LIMIT = 20
+    
+    # Room sharding: rooms are spread over these Socket.IO worker URLs by
+    # consistent hashing, SHARD_SELF is this worker's own entry. Locally:
+    # SHARD_WORKERS=http://127.0.0.1:5001,http://127.0.0.1:5002
+    # SHARD_SELF=http://127.0.0.1:5001 PORT=5001 python run.py
+    SHARD_WORKERS = [url for url in os.environ.get('SHARD_WORKERS', '').split(',') if url]
+    SHARD_SELF = os.environ.get('SHARD_SELF')
+    SHARD_RECENT_MESSAGES = 50
+    SHARD_RELOAD_INTERVAL = 5  # seconds between checks of the shared worker list
+    
+    # Change log behind incremental sync of rooms, memberships and users
+    SYNC_PAGE_SIZE = 500
+    CHANGE_LOG_RETENTION_DAYS = 30  # deletions older than this are compacted away
+    CHANGE_LOG_COMPACT_INTERVAL = 3600  # seconds
+    
     # Default settings
     MAX_USERNAME_LENGTH = 25
     MAX_ROOM_NAME_LENGTH = 50
     MAX_MESSAGE_LENGTH = 500
     DEFAULT_ROOMS = ['General', 'Technology', 'Random', 'Support']
+    
+    # Message retention (rooms can override the number of days)
+    MESSAGE_RETENTION_DAYS = int(os.environ.get('MESSAGE_RETENTION_DAYS', 0)) or None
+    SOFT_DELETE_GRACE_DAYS = int(os.environ.get('SOFT_DELETE_GRACE_DAYS', 30))
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+    ARCHIVE_BATCH_SIZE = 1000
+    ARCHIVE_INTERVAL = int(os.environ.get('ARCHIVE_INTERVAL', 0))  # seconds, 0 disables
+    ARCHIVE_CACHE_SEGMENTS = 32  # parsed month segments kept in memory
+    ARCHIVE_LOCK_TTL = 600  # seconds a retention run holds the archive lease between rooms
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -46,6 +124,15 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    MIGRATE_ENABLED = False
+
+config_by_name = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig
+}
 
-# Default config
-Config = DevelopmentConfig if os.environ.get('FLASK_ENV') == 'development' else ProductionConfig
\ No newline at end of file
+def get_config(name=None):
+    """Return the config class for name, or for FLASK_ENV when name is omitted"""
+    name = name or os.environ.get('FLASK_ENV')
+    return config_by_name.get(name, ProductionConfig)
\ No newline at end of file
@@ -2,5 +2,15 @@
 from .user import User, Role, user_rooms
 from .room import Room
 from .message import Message, MessageType
+from .job import Job, JobStatus
+from .blob import Blob
+from .upload import Upload
+from .revision import MessageRevision
+from .change import Change, ChangeKind
+from .shard import ShardWorker
+from .lock import Lock
+from .cache_version import CacheVersion
 
-__all__ = ['User', 'Role', 'Room', 'Message', 'MessageType', 'user_rooms']
\ No newline at end of file
+__all__ = ['User', 'Role', 'Room', 'Message', 'MessageType', 'Job', 'JobStatus', 'Blob',
+           'Upload', 'MessageRevision', 'Change', 'ChangeKind', 'ShardWorker', 'Lock',
+           'CacheVersion', 'user_rooms']
@@ -0,0 +1,39 @@
+from datetime import datetime
+from app import db
+
+class Blob(db.Model):
+    """Uploaded file, stored on disk under its SHA-256 so identical uploads are kept once.
+
+    Filenames belong to each Upload, created_by is only the first uploader.
+    """
+    __tablename__ = 'blobs'
+    
+    id = db.Column(db.String(64), primary_key=True)  # hex SHA-256 of the content
+    size = db.Column(db.Integer, nullable=False)
+    content_type = db.Column(db.String(128), default='application/octet-stream')
+    has_thumbnail = db.Column(db.Boolean, default=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __init__(self, id, size, content_type=None, created_by=None):
+        self.id = id
+        self.size = size
+        self.content_type = content_type or 'application/octet-stream'
+        self.created_by = created_by
+        self.has_thumbnail = False
+    
+    def is_image(self):
+        return self.content_type.startswith('image/')
+    
+    def to_dict(self):
+        """Convert blob to dictionary for JSON responses"""
+        return {
+            'id': self.id,
+            'size': self.size,
+            'content_type': self.content_type,
+            'has_thumbnail': self.has_thumbnail,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Blob {self.id[:12]}>'
@@ -0,0 +1,15 @@
+from app import db
+
+class CacheVersion(db.Model):
+    """Version counter of cached fragments and validators, shared by every worker"""
+    __tablename__ = 'cache_versions'
+    
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __init__(self, name, value=0):
+        self.name = name
+        self.value = value
+    
+    def __repr__(self):
+        return f'<CacheVersion {self.name}={self.value}>'
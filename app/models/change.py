@@ -0,0 +1,34 @@
+from datetime import datetime
+from app import db
+
+class ChangeKind:
+    ROOM = 'room'
+    MEMBERSHIP = 'membership'  # entity_id is the room, user_id the member
+    USER = 'user'
+    RESET = 'reset'  # entity_id is the highest version dropped by compaction
+
+class Change(db.Model):
+    """Change log entry, its id is the sync version clients keep as a cursor"""
+    __tablename__ = 'changes'
+    __table_args__ = (
+        # Compaction keeps the latest entry per entity
+        db.Index('ix_changes_kind_entity', 'kind', 'entity_id', 'user_id'),
+        # Versions must never be reused after compaction deletes the newest rows
+        {'sqlite_autoincrement': True},
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(16), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    deleted = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __init__(self, kind, entity_id, user_id=None, deleted=False):
+        self.kind = kind
+        self.entity_id = entity_id
+        self.user_id = user_id
+        self.deleted = deleted
+    
+    def __repr__(self):
+        return f'<Change {self.id} {self.kind}:{self.entity_id}>'
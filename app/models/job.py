@@ -0,0 +1,63 @@
+import json
+from datetime import datetime
+from app import db
+
+class JobStatus:
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    FINISHED = (DONE, FAILED, CANCELLED)
+
+class Job(db.Model):
+    """Background job persisted so progress survives restarts and is visible to admins"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    params = db.Column(db.Text, default='{}')
+    status = db.Column(db.String(16), default=JobStatus.PENDING, index=True)
+    progress = db.Column(db.Integer, default=0)
+    total = db.Column(db.Integer, default=0)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    error = db.Column(db.Text)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    # Touched by every progress report, a running job that stops updating is stale
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def __init__(self, kind, params=None, created_by=None):
+        self.kind = kind
+        self.params = json.dumps(params or {})
+        self.created_by = created_by
+        self.status = JobStatus.PENDING
+        self.progress = 0
+        self.total = 0
+        self.cancel_requested = False
+    
+    def get_params(self):
+        return json.loads(self.params or '{}')
+    
+    def is_finished(self):
+        return self.status in JobStatus.FINISHED
+    
+    def to_dict(self):
+        """Convert job to dictionary for JSON responses"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.get_params(),
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'cancel_requested': self.cancel_requested,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind}>'
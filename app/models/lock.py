@@ -0,0 +1,17 @@
+from app import db
+
+class Lock(db.Model):
+    """Named lease held by one process at a time, expired leases can be taken over"""
+    __tablename__ = 'locks'
+    
+    name = db.Column(db.String(64), primary_key=True)
+    holder = db.Column(db.String(32), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __init__(self, name, holder, expires_at):
+        self.name = name
+        self.holder = holder
+        self.expires_at = expires_at
+    
+    def __repr__(self):
+        return f'<Lock {self.name} {self.holder}>'
@@ -10,16 +10,33 @@ class MessageType:
 class Message(db.Model):
     """Message model for chat messages"""
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Room history pages (top-level messages by id) and unread counts
+        db.Index('ix_messages_room_parent_id', 'room_id', 'parent_id', 'id'),
+        db.Index('ix_messages_room_id_id', 'room_id', 'id'),
+        # Admin listings per room and retention cutoffs
+        db.Index('ix_messages_room_created_at', 'room_id', 'created_at'),
+        # Purge of soft-deleted rows past their grace period
+        db.Index('ix_messages_deleted_updated_at', 'is_deleted', 'updated_at'),
+        # Messages sharing a blob, media messages hold its id as content
+        db.Index('ix_messages_blob_content', 'content',
+                 sqlite_where=db.text('message_type IN (1, 2)'),
+                 postgresql_where=db.text('message_type IN (1, 2)')),
+        # Archived messages keep their ids, a new message must never get one of them
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     message_type = db.Column(db.Integer, default=MessageType.TEXT)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
     room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'))
-    parent_id = db.Column(db.Integer, db.ForeignKey('messages.id'), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    parent_id = db.Column(db.Integer, db.ForeignKey('messages.id'), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_edited = db.Column(db.Boolean, default=False)
+    # Bumped on every edit, earlier revisions are kept in message_revisions
+    revision = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     is_deleted = db.Column(db.Boolean, default=False)
     
     # Relationships for replies
@@ -32,11 +49,13 @@ class Message(db.Model):
         self.room_id = room_id
         self.message_type = message_type
         self.parent_id = parent_id
+        self.revision = 0
     
     def edit(self, new_content):
         """Edit message content and mark as edited"""
         self.content = new_content
         self.is_edited = True
+        self.revision += 1
         self.updated_at = datetime.utcnow()
         
     def soft_delete(self):
@@ -58,7 +77,10 @@ class Message(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'is_edited': self.is_edited,
-            'is_deleted': self.is_deleted
+            'revision': self.revision,
+            'is_deleted': self.is_deleted,
+            # Image and file messages hold the id of their blob as content
+            'blob_id': self.content if self.message_type in (MessageType.IMAGE, MessageType.FILE) else None
         }
     
     def __repr__(self):
@@ -0,0 +1,35 @@
+from datetime import datetime
+from app import db
+
+class MessageRevision(db.Model):
+    """Earlier version of an edited message, stored as a delta against the next version"""
+    __tablename__ = 'message_revisions'
+    __table_args__ = (
+        db.UniqueConstraint('message_id', 'revision', name='uq_message_revisions_message_revision'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    message_id = db.Column(db.Integer, db.ForeignKey('messages.id'), nullable=False)
+    revision = db.Column(db.Integer, nullable=False)
+    # JSON list of [start, end, text] edits turning revision + 1 back into this revision
+    delta = db.Column(db.Text, nullable=False)
+    edited_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __init__(self, message_id, revision, delta, edited_by=None):
+        self.message_id = message_id
+        self.revision = revision
+        self.delta = delta
+        self.edited_by = edited_by
+    
+    def to_dict(self):
+        """Convert revision metadata to dictionary for JSON responses"""
+        return {
+            'message_id': self.message_id,
+            'revision': self.revision,
+            'edited_by': self.edited_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<MessageRevision {self.message_id}@{self.revision}>'
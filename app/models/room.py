@@ -1,17 +1,20 @@
 from datetime import datetime
 from app import db
+from app.models.message import Message
+from app.models.user import user_rooms
 
 class Room(db.Model):
     """Room model for chat rooms"""
     __tablename__ = 'rooms'
     
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(64), nullable=False)
+    name = db.Column(db.String(64), nullable=False, index=True)
     description = db.Column(db.String(256))
-    is_private = db.Column(db.Boolean, default=False)
+    is_private = db.Column(db.Boolean, default=False, index=True)
     is_default = db.Column(db.Boolean, default=False)
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    retention_days = db.Column(db.Integer, nullable=True)  # None uses the site default
     
     # Relationships
     messages = db.relationship('Message', backref='room', lazy='dynamic', 
@@ -35,7 +38,10 @@ class Room(db.Model):
     def add_user(self, user):
         """Add a user to this room"""
         if not self.is_member(user):
-            self.members.append(user)
+            # Start the read marker at the newest message, history from before joining isn't unread
+            latest = db.select(db.func.max(Message.id)).where(Message.room_id == self.id)
+            db.session.execute(user_rooms.insert().values(
+                user_id=user.id, room_id=self.id, last_read_message_id=latest.scalar_subquery()))
             return True
         return False
     
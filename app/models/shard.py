@@ -0,0 +1,15 @@
+from app import db
+
+class ShardWorker(db.Model):
+    """Socket.IO worker in the shared shard list, every worker builds its ring from these rows"""
+    __tablename__ = 'shard_workers'
+    
+    url = db.Column(db.String(256), primary_key=True)
+    position = db.Column(db.Integer, nullable=False)
+    
+    def __init__(self, url, position):
+        self.url = url
+        self.position = position
+    
+    def __repr__(self):
+        return f'<ShardWorker {self.url}>'
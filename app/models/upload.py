@@ -0,0 +1,29 @@
+from datetime import datetime
+from app import db
+
+class Upload(db.Model):
+    """One user's upload of a blob, identical files share the blob but keep their own name"""
+    __tablename__ = 'uploads'
+    __table_args__ = (
+        db.Index('ix_uploads_blob_user', 'blob_id', 'user_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    blob_id = db.Column(db.String(64), db.ForeignKey('blobs.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    filename = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    blob = db.relationship('Blob')
+    
+    def __init__(self, blob_id, user_id, filename=None):
+        self.blob_id = blob_id
+        self.user_id = user_id
+        self.filename = filename
+    
+    def to_dict(self):
+        """The blob as its uploader sees it"""
+        return dict(self.blob.to_dict(), upload_id=self.id, filename=self.filename)
+    
+    def __repr__(self):
+        return f'<Upload {self.id} {self.blob_id[:12]}>'
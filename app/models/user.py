@@ -1,7 +1,7 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from app import db, login_manager
+from app.services.passwords import hash_password, verify_password, needs_rehash
 
 # User roles
 class Role:
@@ -18,7 +18,10 @@ class Role:
 user_rooms = db.Table('user_rooms',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
     db.Column('room_id', db.Integer, db.ForeignKey('rooms.id'), primary_key=True),
-    db.Column('joined_at', db.DateTime, default=datetime.utcnow)
+    db.Column('joined_at', db.DateTime, default=datetime.utcnow),
+    db.Column('last_read_message_id', db.Integer, nullable=True),
+    # The primary key covers lookups by user, members of a room need their own index
+    db.Index('ix_user_rooms_room_id', 'room_id', 'user_id')
 )
 
 class User(UserMixin, db.Model):
@@ -28,13 +31,13 @@ class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, index=True)
     email = db.Column(db.String(120), unique=True, index=True)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))
     avatar = db.Column(db.String(200), default='default_avatar.png')
     role = db.Column(db.Integer, default=Role.USER)
     is_active = db.Column(db.Boolean, default=True)
-    is_online = db.Column(db.Boolean, default=False)
+    is_online = db.Column(db.Boolean, default=False, index=True)
     last_seen = db.Column(db.DateTime, default=datetime.utcnow)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Relationships
     messages = db.relationship('Message', backref='author', lazy='dynamic')
@@ -49,10 +52,14 @@ class User(UserMixin, db.Model):
         self.role = role
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """True if the stored hash uses outdated hashing parameters"""
+        return needs_rehash(self.password_hash)
     
     def is_admin(self):
         return self.role == Role.ADMIN
@@ -2,5 +2,6 @@
 from .auth import auth_bp
 from .chat import chat_bp
 from .admin import admin_bp
+from .media import media_bp
 
-__all__ = ['auth_bp', 'chat_bp', 'admin_bp']
\ No newline at end of file
+__all__ = ['auth_bp', 'chat_bp', 'admin_bp', 'media_bp']
\ No newline at end of file
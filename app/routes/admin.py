@@ -4,6 +4,18 @@ from functools import wraps
 from app.models.user import User, Role
 from app.models.room import Room
 from app.models.message import Message
+from app.models.job import Job
+from app.services.db_routing import read_only
+from app.services.offload import hash_pool
+from app.services.ratelimit import rate_limiter
+from app.services.fragment_cache import fragment_cache, bump
+from app.services.http_cache import compressor
+from app.services.loop_monitor import loop_monitor
+from app.services.jobs import enqueue
+from app.services.revisions import drop_history
+from app.services.sharding import shard_router
+from app.services.changes import record
+from app.models.change import ChangeKind
 from app import db
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -31,6 +43,7 @@ def moderator_required(f):
 @admin_bp.route('/dashboard')
 @login_required
 @admin_required
+@read_only
 def dashboard():
     """Admin dashboard with site statistics"""
     stats = {
@@ -39,14 +52,50 @@ def dashboard():
         'total_rooms': Room.query.count(),
         'total_messages': Message.query.count(),
         'recent_users': User.query.order_by(User.created_at.desc()).limit(10).all(),
-        'active_rooms': Room.query.join(Message).group_by(Room.id).order_by(db.func.count(Message.id).desc()).limit(5).all()
+        'active_rooms': Room.query.join(Message).group_by(Room.id).order_by(db.func.count(Message.id).desc()).limit(5).all(),
+        'hashing': hash_pool.stats(),
+        'fragment_cache': fragment_cache.stats(),
+        'compression': compressor.stats(),
+        'event_loop': loop_monitor.stats()
     }
     
     return render_template('admin/dashboard.html', title='Admin Dashboard', stats=stats)
 
+@admin_bp.route('/rate_limits')
+@login_required
+@admin_required
+def rate_limits():
+    """Socket.IO rate limit rejections"""
+    return jsonify({'success': True, 'limits': rate_limiter.limits, **rate_limiter.stats()})
+
+@admin_bp.route('/event_loop')
+@login_required
+@admin_required
+def event_loop():
+    """Event loop lag and the handlers that blocked it"""
+    return jsonify({'success': True, 'lag': loop_monitor.stats(),
+                    'handlers': loop_monitor.handler_stats()})
+
+@admin_bp.route('/shards', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def shards():
+    """Room shard assignment of this worker, POST a new worker list to rebalance all workers"""
+    moved = []
+    if request.method == 'POST':
+        workers = (request.get_json(silent=True) or {}).get('workers')
+        if (not isinstance(workers, list) or not workers
+                or not all(isinstance(url, str) and url for url in workers)):
+            return jsonify({'success': False, 'message': 'workers must be a list of URLs'}), 400
+        # Saved for the other workers, this one switches right away
+        shard_router.save_workers(workers)
+        moved = shard_router.rebalance(workers)
+    return jsonify({'success': True, 'moved': moved, **shard_router.stats()})
+
 @admin_bp.route('/users')
 @login_required
 @admin_required
+@read_only
 def users():
     """Manage users"""
     page = request.args.get('page', 1, type=int)
@@ -72,6 +121,7 @@ def change_user_role(user_id):
         return jsonify({'success': False, 'message': 'Cannot change your own role'}), 400
     
     user.role = new_role
+    record(ChangeKind.USER, user.id)
     db.session.commit()
     
     return jsonify({
@@ -93,6 +143,7 @@ def toggle_user_active(user_id):
     user.is_active = not user.is_active
     if not user.is_active:
         user.is_online = False
+    record(ChangeKind.USER, user.id)
     
     db.session.commit()
     
@@ -105,6 +156,7 @@ def toggle_user_active(user_id):
 @admin_bp.route('/rooms')
 @login_required
 @moderator_required
+@read_only
 def rooms():
     """Manage rooms"""
     page = request.args.get('page', 1, type=int)
@@ -125,18 +177,57 @@ def delete_room(room_id):
     if room.is_default:
         return jsonify({'success': False, 'message': 'Cannot delete default rooms'}), 400
     
-    room_name = room.name
-    db.session.delete(room)
-    db.session.commit()
+    # Deleting a big room takes a while, hand it to the job worker
+    job = enqueue('delete_room', {'room_id': room.id}, current_user.id)
     
     return jsonify({
         'success': True, 
-        'message': f'Room "{room_name}" deleted successfully'
-    })
+        'message': f'Deletion of room "{room.name}" started',
+        'job': job.to_dict()
+    }), 202
+
+@admin_bp.route('/user/<int:user_id>/purge_messages', methods=['POST'])
+@login_required
+@moderator_required
+def purge_user_messages(user_id):
+    """Delete all messages of a user"""
+    user = User.query.get_or_404(user_id)
+    
+    job = enqueue('purge_user_messages', {'user_id': user.id}, current_user.id)
+    
+    return jsonify({
+        'success': True,
+        'message': f'Deleting all messages of {user.username}',
+        'job': job.to_dict()
+    }), 202
+
+@admin_bp.route('/job/<int:job_id>')
+@login_required
+@moderator_required
+def job_status(job_id):
+    """Progress of a background job"""
+    job = Job.query.get_or_404(job_id)
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@admin_bp.route('/job/<int:job_id>/cancel', methods=['POST'])
+@login_required
+@moderator_required
+def cancel_job(job_id):
+    """Ask a background job to stop after its current chunk"""
+    job = Job.query.get_or_404(job_id)
+    
+    if job.is_finished():
+        return jsonify({'success': False, 'message': 'Job already finished'}), 400
+    
+    job.cancel_requested = True
+    db.session.commit()
+    
+    return jsonify({'success': True, 'message': 'Cancellation requested', 'job': job.to_dict()})
 
 @admin_bp.route('/messages')
 @login_required
 @moderator_required
+@read_only
 def messages():
     """Manage messages"""
     page = request.args.get('page', 1, type=int)
@@ -166,7 +257,9 @@ def delete_message(message_id):
     message = Message.query.get_or_404(message_id)
     
     message.soft_delete()
+    drop_history([message.id])
     db.session.commit()
+    bump(f'room:{message.room_id}')
     
     return jsonify({
         'success': True, 
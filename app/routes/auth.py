@@ -1,44 +1,19 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
-from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField
-from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models.user import User
+from app.models.change import ChangeKind
+from app.services.changes import record
 from app import db
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
-# Form classes
-class LoginForm(FlaskForm):
-    email = StringField('Email', validators=[DataRequired(), Email()])
-    password = PasswordField('Password', validators=[DataRequired()])
-    remember_me = BooleanField('Remember Me')
-    submit = SubmitField('Sign In')
-
-class RegistrationForm(FlaskForm):
-    username = StringField('Username', validators=[DataRequired(), Length(min=3, max=64)])
-    email = StringField('Email', validators=[DataRequired(), Email()])
-    password = PasswordField('Password', validators=[DataRequired(), Length(min=8)])
-    password2 = PasswordField('Confirm Password', 
-                             validators=[DataRequired(), EqualTo('password')])
-    submit = SubmitField('Register')
-    
-    def validate_username(self, username):
-        user = User.query.filter_by(username=username.data).first()
-        if user is not None:
-            raise ValidationError('Username already taken. Please choose a different one.')
-    
-    def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
-        if user is not None:
-            raise ValidationError('Email already registered. Please use a different one.')
-
 # Routes
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('chat.index'))
     
+    from app.forms import LoginForm
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
@@ -46,6 +21,10 @@ def login():
             flash('Invalid email or password', 'danger')
             return redirect(url_for('auth.login'))
         
+        # Upgrade the hash to the current parameters while we have the password
+        if user.password_needs_rehash():
+            user.set_password(form.password.data)
+        
         login_user(user, remember=form.remember_me.data)
         user.is_online = True
         db.session.commit()
@@ -64,6 +43,7 @@ def register():
     if current_user.is_authenticated:
         return redirect(url_for('chat.index'))
     
+    from app.forms import RegistrationForm
     form = RegistrationForm()
     if form.validate_on_submit():
         user = User(
@@ -73,6 +53,8 @@ def register():
         )
         
         db.session.add(user)
+        db.session.flush()
+        record(ChangeKind.USER, user.id)
         db.session.commit()
         
         flash('Registration successful! You can now log in.', 'success')
@@ -1,54 +1,127 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+import time
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
+from markupsafe import Markup
 from flask_login import login_required, current_user
 from app.models.room import Room
 from app.models.message import Message
-from app.models.user import User
-from app import db, config
-import bleach
+from app.models.user import User, user_rooms
+from app.services.db_routing import replica_reads, read_only
+from app.services.archive import read_archive
+from app.services.read_markers import unread_counts, read_positions, flush
+from app.services.presence import online_members
+from app.services.fragment_cache import fragment_cache, bump, version, versions
+from app.services.http_cache import conditional
+from app.services.revisions import revisions, content_at
+from app.services.sharding import shard_router
+from app.services.changes import record, changes_since, room_entry
+from app.models.change import ChangeKind
+from app import db
 
 chat_bp = Blueprint('chat', __name__)
 
 # Helper functions
 def sanitize_input(text):
     """Sanitize input to prevent XSS attacks"""
+    import bleach  # deferred, bleach is slow to import
     allowed_tags = ['b', 'i', 'u', 'em', 'strong', 'code', 'pre']
     return bleach.clean(text, tags=allowed_tags, strip=True)
 
+def room_entries(query):
+    """Rooms of a query as dicts with member counts, counted in one grouped query"""
+    rooms = query.all()
+    counts = dict(db.session.query(user_rooms.c.room_id, db.func.count())
+                  .filter(user_rooms.c.room_id.in_([room.id for room in rooms]))
+                  .group_by(user_rooms.c.room_id))
+    return [dict(room_entry(room), user_count=counts.get(room.id, 0)) for room in rooms]
+
+def render_sidebar(user):
+    """Rooms sidebar, the public section is shared and the private one is per user"""
+    rooms_version = version('rooms')
+    
+    def render_section(section, heading, query):
+        with replica_reads():
+            rooms = room_entries(query)
+        return render_template('chat/_sidebar.html', section=section, heading=heading, rooms=rooms)
+    
+    public_html = fragment_cache.get_or_render(
+        ('sidebar_public', rooms_version),
+        lambda: render_section('public', 'Rooms', Room.query.filter_by(is_private=False))
+    )
+    private_html = fragment_cache.get_or_render(
+        ('sidebar_private', user.id, rooms_version),
+        lambda: render_section('private', 'Private rooms', user.rooms.filter_by(is_private=True))
+    )
+    return Markup(public_html + private_html)
+
+def cached_unread_counts(user):
+    """Unread counts of a user, cached until a message or read marker in one of their rooms moves"""
+    # The user's own buffered markers must be written to be part of the key
+    flush(user.id)
+    positions = read_positions(user.id)
+    room_versions = versions([f'room:{room_id}' for room_id in positions])
+    key = ('unread', user.id, tuple(sorted(positions.items())), tuple(sorted(room_versions.items())))
+    return fragment_cache.get_or_render(key, lambda: unread_counts(user.id))
+
+def render_history(room_id):
+    """Most recent 100 top-level messages of a room"""
+    def render():
+        with replica_reads():
+            messages = (Message.query
+                        .filter_by(room_id=room_id, parent_id=None)
+                        .order_by(Message.id.desc())
+                        .limit(100)
+                        .all())
+            messages = [msg.to_dict() for msg in reversed(messages)]
+        return render_template('chat/_history.html', messages=messages)
+    
+    return Markup(fragment_cache.get_or_render(('history', room_id, version(f'room:{room_id}')), render))
+
+def rooms_etag():
+    """Validator for the room listing, counts are not versioned so it also expires with the TTL"""
+    return (f"rooms-{version('rooms')}-{current_user.id}-"
+            f"{int(time.time() // fragment_cache.ttl)}")
+
+def history_etag(room_id):
+    """Validator for a page of room history, None (no 304) unless the room is readable"""
+    # Checked before the 304 short-circuit, the view then answers 404/403 itself
+    room = Room.query.get(room_id)
+    if room is None or (room.is_private and not room.is_member(current_user)):
+        return None
+    return (f"history-{room_id}-{version(f'room:{room_id}')}-"
+            f"{request.args.get('before', '')}-{request.args.get('limit', '')}")
+
 # Routes
 @chat_bp.route('/')
 @login_required
 def index():
     """Main chat interface with room selection"""
-    # Get all public rooms and user's private rooms
-    public_rooms = Room.query.filter_by(is_private=False).all()
-    private_rooms = current_user.rooms.filter_by(is_private=True).all()
-    
     # Check if we need to create default rooms
-    if not public_rooms:
-        for room_name in config.DEFAULT_ROOMS:
+    if Room.query.filter_by(is_private=False).first() is None:
+        for room_name in current_app.config['DEFAULT_ROOMS']:
             room = Room(name=room_name, description=f"Default {room_name} chat room", is_default=True)
             db.session.add(room)
+            db.session.flush()
+            record(ChangeKind.ROOM, room.id)
         db.session.commit()
-        public_rooms = Room.query.filter_by(is_private=False).all()
+        bump('rooms')
     
     # If user isn't in any room yet, add them to the General room
     if not current_user.rooms.count():
         general_room = Room.query.filter(Room.name == 'General').first()
         if general_room:
             general_room.add_user(current_user)
+            record(ChangeKind.MEMBERSHIP, general_room.id, current_user.id)
             db.session.commit()
-    
-    rooms = {
-        'public': [room.to_dict() for room in public_rooms],
-        'private': [room.to_dict() for room in private_rooms]
-    }
+            bump('rooms')
     
     # If a room_id is specified, redirect to that room
     room_id = request.args.get('room_id')
     if room_id:
         return redirect(url_for('chat.room', room_id=room_id))
     
-    return render_template('chat/index.html', title='Jacario', rooms=rooms)
+    return render_template('chat/index.html', title='Jacario',
+                          sidebar_html=render_sidebar(current_user),
+                          unread=cached_unread_counts(current_user))
 
 @chat_bp.route('/room/<int:room_id>')
 @login_required
@@ -64,35 +137,129 @@ def room(room_id):
     # Join room if not already a member
     if not room.is_member(current_user):
         room.add_user(current_user)
+        record(ChangeKind.MEMBERSHIP, room.id, current_user.id)
         db.session.commit()
+        bump('rooms')
+    
+    # First page of online users in this room, without loading every member
+    online = online_members(room_id)
+    online_users = online.items
     
-    # Get recent messages for this room (most recent 100 messages)
-    messages = (Message.query
-                .filter_by(room_id=room_id, parent_id=None)
-                .order_by(Message.created_at.desc())
-                .limit(100)
-                .all())
+    return render_template('chat/room.html', 
+                          title=f'Jacario - {room.name}',
+                          room=room.to_dict(),
+                          history_html=render_history(room_id),
+                          sidebar_html=render_sidebar(current_user),
+                          online_users=online_users,
+                          online_total=online.total)
+
+@chat_bp.route('/room/<int:room_id>/history')
+@login_required
+@conditional(history_etag)
+@read_only
+def room_history(room_id):
+    """Page through older messages, falling back to the archive past the hot range"""
+    room = Room.query.get_or_404(room_id)
     
-    messages = [msg.to_dict() for msg in reversed(messages)]
+    if room.is_private and not room.is_member(current_user):
+        return jsonify({'success': False, 'message': 'Access denied to this room'}), 403
     
-    # Get all rooms for the sidebar
-    public_rooms = Room.query.filter_by(is_private=False).all()
-    private_rooms = current_user.rooms.filter_by(is_private=True).all()
+    before = request.args.get('before', type=int)
+    limit = min(request.args.get('limit', 50, type=int), 100)
     
-    rooms = {
-        'public': [r.to_dict() for r in public_rooms],
-        'private': [r.to_dict() for r in private_rooms]
-    }
+    query = Message.query.filter_by(room_id=room_id, parent_id=None)
+    if before:
+        query = query.filter(Message.id < before)
+    messages = [msg.to_dict() for msg in query.order_by(Message.id.desc()).limit(limit).all()]
     
-    # List of online users in this room
-    online_users = [user for user in room.members if user.is_online]
+    # Older messages have been moved to the archive
+    if len(messages) < limit:
+        oldest = messages[-1]['id'] if messages else before
+        messages.extend(read_archive(current_app, room_id, oldest, limit - len(messages)))
     
-    return render_template('chat/room.html', 
-                          title=f'Jacario - {room.name}',
-                          room=room.to_dict(),
-                          messages=messages,
-                          rooms=rooms,
-                          online_users=online_users)
+    return jsonify({
+        'success': True,
+        'room_id': room_id,
+        'messages': list(reversed(messages)),
+        'has_more': len(messages) == limit
+    })
+
+@chat_bp.route('/room/<int:room_id>/owner')
+@login_required
+def room_owner(room_id):
+    """Socket.IO worker serving a room, null when rooms aren't sharded"""
+    return jsonify({'success': True, 'room_id': room_id, 'worker': shard_router.owner(room_id)})
+
+def readable_message(message_id):
+    """Message by id, or an error response if the current user can't see its room"""
+    message = Message.query.get_or_404(message_id)
+    room = Room.query.get(message.room_id)
+    if room and room.is_private and not room.is_member(current_user):
+        return None, (jsonify({'success': False, 'message': 'Access denied to this room'}), 403)
+    return message, None
+
+@chat_bp.route('/message/<int:message_id>')
+@login_required
+@read_only
+def get_message(message_id):
+    """Current version of a message, for clients that missed an edit"""
+    message, error = readable_message(message_id)
+    if error:
+        return error
+    return jsonify({'success': True, 'message': message.to_dict()})
+
+@chat_bp.route('/message/<int:message_id>/revisions')
+@login_required
+@read_only
+def message_revisions(message_id):
+    """Retained edit history of a message, newest first"""
+    message, error = readable_message(message_id)
+    if error:
+        return error
+    return jsonify({
+        'success': True,
+        'message_id': message.id,
+        'revision': message.revision,
+        'revisions': [revision.to_dict() for revision in revisions(message)]
+    })
+
+@chat_bp.route('/message/<int:message_id>/revisions/<int:revision>')
+@login_required
+@read_only
+def message_revision(message_id, revision):
+    """Rebuild the content of a message at an earlier revision"""
+    message, error = readable_message(message_id)
+    if error:
+        return error
+    if message.is_deleted:
+        return jsonify({'success': False, 'message': 'Message was deleted'}), 404
+    
+    content = content_at(message, revision)
+    if content is None:
+        return jsonify({'success': False, 'message': 'Revision not available'}), 404
+    return jsonify({'success': True, 'message_id': message.id,
+                    'revision': revision, 'content': content})
+
+@chat_bp.route('/sync')
+@login_required
+@read_only
+def sync():
+    """Rooms, memberships and users changed since the client's version"""
+    since = request.args.get('since', type=int)
+    changes = changes_since(since, current_user, current_app.config['SYNC_PAGE_SIZE'])
+    return jsonify({'success': True, **changes})
+
+@chat_bp.route('/rooms/list')
+@login_required
+@conditional(rooms_etag)
+@read_only
+def list_rooms():
+    """Public and private rooms as JSON, answering 304 while the room set is unchanged"""
+    return jsonify({
+        'success': True,
+        'public': room_entries(Room.query.filter_by(is_private=False)),
+        'private': room_entries(current_user.rooms.filter_by(is_private=True))
+    })
 
 @chat_bp.route('/room/create', methods=['POST'])
 @login_required
@@ -122,7 +289,10 @@ def create_room():
     db.session.add(room)
     db.session.commit()
     room.add_user(current_user)
+    record(ChangeKind.ROOM, room.id)
+    record(ChangeKind.MEMBERSHIP, room.id, current_user.id)
     db.session.commit()
+    bump('rooms')
     
     return jsonify({
         'success': True,
@@ -143,7 +313,9 @@ def join_room(room_id):
     
     # Join the room
     if room.add_user(current_user):
+        record(ChangeKind.MEMBERSHIP, room.id, current_user.id)
         db.session.commit()
+        bump('rooms')
         return jsonify({'success': True, 'message': f'You joined {room.name}'})
     else:
         return jsonify({'success': False, 'message': 'You are already in this room'}), 400
@@ -159,7 +331,9 @@ def leave_room(room_id):
         return jsonify({'success': False, 'message': 'Cannot leave default rooms'}), 400
     
     if room.remove_user(current_user):
+        record(ChangeKind.MEMBERSHIP, room.id, current_user.id, deleted=True)
         db.session.commit()
+        bump('rooms')
         return jsonify({'success': True, 'message': f'You left {room.name}'})
     else:
         return jsonify({'success': False, 'message': 'You are not in this room'}), 400
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+from flask import Blueprint, request, jsonify, send_file, abort, current_app
+from flask_login import login_required, current_user
+from werkzeug.utils import secure_filename
+from app.models.blob import Blob
+from app.services.media import (save_upload, readable_filename, blob_path, thumbnail_path,
+                                UploadTooLarge)
+
+media_bp = Blueprint('media', __name__, url_prefix='/media')
+
+# Blobs never change once stored, so they can be cached for a year
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+# The content type is whatever the uploader claimed, only these are safe to
+# render inline from our origin. Everything else is sent as a download.
+INLINE_TYPES = {
+    'image/png', 'image/jpeg', 'image/gif', 'image/webp',
+    'video/mp4', 'video/webm', 'audio/mpeg', 'audio/ogg', 'audio/wav', 'audio/webm'
+}
+
+def send_blob(path, mimetype, etag, download_name):
+    """Send a stored file with range support and long-lived cache headers"""
+    if not os.path.exists(path):
+        abort(404)
+
+    inline = mimetype in INLINE_TYPES
+    response = send_file(path, mimetype=mimetype if inline else 'application/octet-stream',
+                         as_attachment=not inline, conditional=True, etag=etag,
+                         max_age=CACHE_MAX_AGE, download_name=download_name)
+    response.cache_control.immutable = True
+    return response
+
+def readable_blob(blob_id):
+    """Blob and its name for the current user, 404 if it's missing or they may not read it"""
+    blob = Blob.query.get_or_404(blob_id)
+    filename = readable_filename(current_user, blob.id)
+    if filename is None:
+        # Same answer as a missing blob, hashes must not be probed
+        abort(404)
+    return blob, filename
+
+@media_bp.after_request
+def harden_media(response):
+    """Never let browsers sniff or run anything served from /media"""
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = "default-src 'none'; sandbox"
+    return response
+
+@media_bp.route('/upload', methods=['POST'])
+@login_required
+def upload():
+    """Upload a file sent as the raw request body, streamed to storage in chunks"""
+    if request.content_length and request.content_length > current_app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({'success': False, 'message': 'File too large'}), 413
+
+    filename = secure_filename(request.headers.get('X-Filename') or request.args.get('filename', ''))
+
+    try:
+        # The real app object, the thumbnail task outlives this request
+        upload = save_upload(current_app._get_current_object(), request.stream, request.mimetype,
+                             filename or None, current_user.id)
+    except UploadTooLarge:
+        return jsonify({'success': False, 'message': 'File too large'}), 413
+
+    return jsonify({'success': True, 'blob': upload.to_dict()})
+
+@media_bp.route('/<blob_id>')
+@login_required
+def download(blob_id):
+    """Serve a file to its uploaders and readers of a room it was shared in"""
+    blob, filename = readable_blob(blob_id)
+    return send_blob(blob_path(current_app, blob.id), blob.content_type, blob.id, filename)
+
+@media_bp.route('/<blob_id>/thumbnail')
+@login_required
+def thumbnail(blob_id):
+    """Serve the thumbnail of an image, to the same users as the image itself"""
+    blob, filename = readable_blob(blob_id)
+    if not blob.has_thumbnail:
+        abort(404)
+    return send_blob(thumbnail_path(current_app, blob.id), 'image/jpeg', f'{blob.id}-thumb', filename)
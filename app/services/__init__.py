@@ -0,0 +1,3 @@
+# Support services shared by routes and socket events.
+# Modules here must not import from the app package at import time
+# unless they are only imported after the extensions are created.
@@ -0,0 +1,236 @@
+import bisect
+import gzip
+import json
+import os
+import shutil
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.orm import aliased, joinedload
+from app import db, socketio
+from app.models.message import Message
+from app.models.room import Room
+from app.services.fragment_cache import bump
+from app.services.locks import acquire, release
+from app.services.revisions import drop_history
+
+# Lease serialising every writer of archive segments across processes
+ARCHIVE_LOCK = 'archive'
+
+# Parsed segments by path: ((mtime, size), ids, records), least recently used first
+_segments = OrderedDict()
+
+def segment_dir(app, room_id):
+    """Directory holding the archive segments of one room"""
+    return os.path.join(app.config['ARCHIVE_DIR'], f'room_{room_id}')
+
+def segment_path(app, room_id, month):
+    """Path of the archive segment for a room and a 'YYYY-MM' month"""
+    return os.path.join(segment_dir(app, room_id), f'{month}.jsonl.gz')
+
+def retention_days(app, room):
+    """Days of hot history kept for a room, or None to keep everything"""
+    return room.retention_days or app.config['MESSAGE_RETENTION_DAYS']
+
+def archived_ids(path):
+    """Ids of every record already in a segment, empty if it doesn't exist yet"""
+    if not os.path.exists(path):
+        return set()
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return {json.loads(line)['id'] for line in f}
+
+def archive_room(app, room_id, cutoff):
+    """Move messages older than cutoff from the messages table into archive segments.
+
+    Batches go newest first so replies leave before their parents, and a
+    parent with a reply newer than cutoff stays until that reply ages out.
+    Records already in a segment, written by a run that died before its
+    commit, are not appended again.
+    """
+    batch_size = app.config['ARCHIVE_BATCH_SIZE']
+    os.makedirs(segment_dir(app, room_id), exist_ok=True)
+    reply = aliased(Message)
+    hot_reply = db.exists().where(reply.parent_id == Message.id, reply.created_at >= cutoff)
+    # Month -> ids in its segment, read once per run
+    present = {}
+    archived = 0
+
+    while True:
+        batch = (Message.query
+                 .options(joinedload(Message.author))
+                 .filter(Message.room_id == room_id, Message.created_at < cutoff, ~hot_reply)
+                 .order_by(Message.id.desc())
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+
+        # Group by month, one gzip member appended per segment per batch
+        segments = {}
+        for message in batch:
+            month = message.created_at.strftime('%Y-%m')
+            if month not in present:
+                present[month] = archived_ids(segment_path(app, room_id, month))
+            if message.id not in present[month]:
+                segments.setdefault(month, []).append(message.to_dict())
+
+        for month, records in segments.items():
+            with gzip.open(segment_path(app, room_id, month), 'at', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+        # Only delete once the segment is on disk
+        ids = [message.id for message in batch]
+        drop_history(ids)
+        Message.query.filter(Message.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        db.session.expunge_all()
+        bump(f'room:{room_id}')
+        archived += len(ids)
+
+    return archived
+
+def purge_deleted(app, now=None):
+    """Hard delete soft-deleted messages once their grace period has passed.
+
+    A message is kept while it has replies that are not being purged with
+    it, so parent_id never points at a missing row.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=app.config['SOFT_DELETE_GRACE_DAYS'])
+    expired = db.and_(Message.is_deleted == True, Message.updated_at < cutoff)
+    reply = aliased(Message)
+    kept_reply = db.exists().where(
+        reply.parent_id == Message.id,
+        db.not_(db.and_(reply.is_deleted == True, reply.updated_at < cutoff))
+    )
+    purged = (Message.query
+              .filter(expired, ~kept_reply)
+              .delete(synchronize_session=False))
+    db.session.commit()
+    return purged
+
+def run_retention(app, now=None):
+    """Archive every room past its retention window and purge old soft-deleted rows.
+
+    Only one process runs it at a time, the others return skipped=True.
+    """
+    now = now or datetime.utcnow()
+    ttl = app.config['ARCHIVE_LOCK_TTL']
+    if not acquire(ARCHIVE_LOCK, ttl):
+        return {'archived': 0, 'purged': 0, 'skipped': True}
+
+    archived = 0
+    try:
+        # Read the schedule up front, archiving commits and clears the session
+        schedule = [(room.id, retention_days(app, room)) for room in Room.query.all()]
+        for room_id, days in schedule:
+            if days:
+                # Extend the lease as we go so long runs keep it
+                acquire(ARCHIVE_LOCK, ttl)
+                archived += archive_room(app, room_id, now - timedelta(days=days))
+
+        purged = purge_deleted(app, now)
+    finally:
+        release(ARCHIVE_LOCK)
+
+    app.logger.info('Retention run: %d archived, %d purged', archived, purged)
+    return {'archived': archived, 'purged': purged, 'skipped': False}
+
+def load_segment(app, path):
+    """Top-level records of a segment sorted by id, with their ids for bisecting.
+
+    Parsed segments are kept in a small LRU keyed by path and checked
+    against the file's mtime and size, so a segment is only decompressed
+    again after the retention job appended to it.
+    """
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _segments.get(path)
+    if cached is not None and cached[0] == stamp:
+        _segments.move_to_end(path)
+        return cached[1], cached[2]
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        records = [record for record in map(json.loads, f) if record['parent_id'] is None]
+    records.sort(key=lambda r: r['id'])
+    ids = [record['id'] for record in records]
+
+    _segments[path] = (stamp, ids, records)
+    while len(_segments) > app.config['ARCHIVE_CACHE_SEGMENTS']:
+        _segments.popitem(last=False)
+    return ids, records
+
+def read_archive(app, room_id, before_id=None, limit=100):
+    """Return up to limit archived top-level messages older than before_id, newest first"""
+    directory = segment_dir(app, room_id)
+    if not os.path.isdir(directory):
+        return []
+
+    results = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith('.jsonl.gz'):
+            continue
+
+        ids, records = load_segment(app, os.path.join(directory, name))
+        end = bisect.bisect_left(ids, before_id) if before_id is not None else len(ids)
+        start = max(0, end - (limit - len(results)))
+        results.extend(reversed(records[start:end]))
+        if len(results) >= limit:
+            break
+
+    return results
+
+def drop_room_archive(app, room_id):
+    """Remove a deleted room's segments, room ids can be reused by a new room"""
+    directory = segment_dir(app, room_id)
+    for path in [path for path in _segments if os.path.dirname(path) == directory]:
+        del _segments[path]
+    shutil.rmtree(directory, ignore_errors=True)
+
+def redact_user(app, user_id):
+    """Blank a user's archived messages like a soft delete, returns the ids of rooms touched"""
+    root = app.config['ARCHIVE_DIR']
+    if not os.path.isdir(root):
+        return []
+
+    # Rewriting a segment while retention appends to it would lose the appended batch
+    while not acquire(ARCHIVE_LOCK, app.config['ARCHIVE_LOCK_TTL']):
+        socketio.sleep(1)
+    try:
+        rooms = _redact_segments(root, user_id)
+    finally:
+        release(ARCHIVE_LOCK)
+
+    for room_id in rooms:
+        bump(f'room:{room_id}')
+    return sorted(rooms)
+
+def _redact_segments(root, user_id):
+    rooms = set()
+    for room_dir in os.listdir(root):
+        directory = os.path.join(root, room_dir)
+        if not room_dir.startswith('room_') or not os.path.isdir(directory):
+            continue
+
+        for name in os.listdir(directory):
+            if not name.endswith('.jsonl.gz'):
+                continue
+            path = os.path.join(directory, name)
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                records = [json.loads(line) for line in f]
+
+            changed = False
+            for record in records:
+                if record['user_id'] == user_id and not record['is_deleted']:
+                    record.update(content='[This message was deleted]', is_deleted=True, blob_id=None)
+                    changed = True
+            if not changed:
+                continue
+
+            # Write a new segment and swap it in, readers never see a partial file
+            with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            os.replace(path + '.tmp', path)
+            rooms.add(records[0]['room_id'])
+    return rooms
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models.change import Change, ChangeKind
+from app.models.room import Room
+from app.models.user import User
+from app.services.read_markers import member_room_ids
+
+def record(kind, entity_id, user_id=None, deleted=False):
+    """Log a change in the current transaction, the caller commits it with the change itself"""
+    db.session.add(Change(kind, entity_id, user_id=user_id, deleted=deleted))
+
+def forget_room(room_id):
+    """Log a room deletion, dropping the membership entries it makes obsolete"""
+    changes = Change.__table__
+    db.session.execute(changes.delete().where(changes.c.kind == ChangeKind.MEMBERSHIP,
+                                              changes.c.entity_id == room_id))
+    record(ChangeKind.ROOM, room_id, deleted=True)
+
+def current_version():
+    return db.session.query(db.func.coalesce(db.func.max(Change.id), 0)).scalar()
+
+def reset_floor():
+    """Highest version dropped by compaction, clients behind it must resync in full"""
+    floor = (db.session.query(db.func.max(Change.entity_id))
+             .filter(Change.kind == ChangeKind.RESET)
+             .scalar())
+    return floor or 0
+
+def room_entry(room):
+    # No member or message counts, they would cost two queries per room
+    return {
+        'id': room.id,
+        'name': room.name,
+        'description': room.description,
+        'is_private': room.is_private,
+        'is_default': room.is_default,
+        'created_at': room.created_at.isoformat() if room.created_at else None
+    }
+
+def user_entry(user, moderator=False):
+    entry = {
+        'id': user.id,
+        'username': user.username,
+        'avatar': user.avatar
+    }
+    # Roles and account status are for moderators only
+    if moderator:
+        entry.update(role=user.role, is_active=user.is_active)
+    return entry
+
+def changes_since(since, user, limit):
+    """Rooms, memberships and users changed after version since, as seen by user.
+
+    Only the latest change per entity is returned and current rows are
+    read in one query per kind. A client without a version (since None),
+    behind the compaction floor or ahead of the log, gets reset=True and
+    should fetch the full listings, then sync from the returned version.
+    """
+    version = current_version()
+    if since is None or since < reset_floor() or since > version:
+        return {'reset': True, 'version': version, 'has_more': False}
+
+    entries = (Change.query
+               .filter(Change.id > since, Change.kind != ChangeKind.RESET)
+               .order_by(Change.id)
+               .limit(limit)
+               .all())
+    version = entries[-1].id if entries else since
+
+    # Later entries for the same entity win
+    latest = {}
+    for entry in entries:
+        latest[(entry.kind, entry.entity_id, entry.user_id)] = entry
+
+    room_ids = {entity_id for kind, entity_id, _ in latest if kind == ChangeKind.ROOM}
+    user_ids = {entity_id for kind, entity_id, _ in latest if kind == ChangeKind.USER}
+    rooms = {room.id: room for room in Room.query.filter(Room.id.in_(room_ids))} if room_ids else {}
+    users = {u.id: u for u in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+
+    # Private rooms are only visible to their members and moderators
+    moderator = user.is_moderator()
+    visible = None if moderator else set(member_room_ids(user.id))
+
+    result = {'reset': False, 'version': version, 'has_more': len(entries) == limit,
+              'rooms': [], 'deleted_rooms': [], 'joined': [], 'left': [],
+              'users': [], 'deleted_users': []}
+    for (kind, entity_id, user_id), entry in latest.items():
+        if kind == ChangeKind.ROOM:
+            room = rooms.get(entity_id)
+            if entry.deleted or room is None:
+                result['deleted_rooms'].append(entity_id)
+            elif not room.is_private or visible is None or room.id in visible:
+                result['rooms'].append(room_entry(room))
+        elif kind == ChangeKind.MEMBERSHIP and user_id == user.id:
+            result['left' if entry.deleted else 'joined'].append(entity_id)
+        elif kind == ChangeKind.USER:
+            member = users.get(entity_id)
+            if entry.deleted or member is None:
+                result['deleted_users'].append(entity_id)
+            else:
+                result['users'].append(user_entry(member, moderator))
+    return result
+
+def compact(app, now=None):
+    """Keep the change log bounded.
+
+    Entries superseded by a later one for the same entity are dropped, so
+    the log holds at most one entry per live room, membership and user.
+    Deletions older than CHANGE_LOG_RETENTION_DAYS are dropped too and a
+    reset marker records the highest version removed.
+    """
+    now = now or datetime.utcnow()
+    changes = Change.__table__
+
+    latest = (db.select(db.func.max(changes.c.id))
+              .group_by(changes.c.kind, changes.c.entity_id, changes.c.user_id))
+    superseded = db.session.execute(changes.delete().where(changes.c.id.not_in(latest))).rowcount
+
+    cutoff = now - timedelta(days=app.config['CHANGE_LOG_RETENTION_DAYS'])
+    expired = changes.c.deleted == True, changes.c.created_at < cutoff
+    floor = db.session.query(db.func.max(changes.c.id)).filter(*expired).scalar()
+    dropped = 0
+    if floor:
+        dropped = db.session.execute(changes.delete().where(*expired)).rowcount
+        db.session.execute(changes.delete().where(changes.c.kind == ChangeKind.RESET))
+        record(ChangeKind.RESET, floor)
+    db.session.commit()
+    return {'superseded': superseded, 'dropped': dropped}
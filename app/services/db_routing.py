@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+
+# Bind key of the read-only database in SQLALCHEMY_BINDS
+REPLICA_BIND = 'replica'
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica bind when the handler asks for it.
+
+    Writes, flushes and anything issued while the session holds pending
+    changes stay on the primary, as does everything after a commit in the
+    same request, so a handler always reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica():
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def commit(self):
+        super().commit()
+        if has_app_context():
+            g.db_wrote = True
+
+    def _use_replica(self):
+        if not has_app_context() or g.get('db_route') != REPLICA_BIND:
+            return False
+        if g.get('db_wrote'):
+            return False
+        if self._flushing or self.new or self.dirty or self.deleted:
+            return False
+        return REPLICA_BIND in self._db.engines
+
+@contextmanager
+def replica_reads():
+    """Route queries issued inside the block to the replica bind"""
+    previous = g.get('db_route')
+    g.db_route = REPLICA_BIND
+    try:
+        yield
+    finally:
+        g.db_route = previous
+
+def read_only(f):
+    """Decorator for handlers that only read, so all their queries use the replica"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with replica_reads():
+            return f(*args, **kwargs)
+    return decorated_function
+
+def enable_sqlite_wal(engine):
+    """Switch a SQLite primary to WAL so replica readers see committed snapshots"""
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA journal_mode=WAL')
@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.cache_version import CacheVersion
+
+# Version counters, bumped whenever what they describe changes:
+# 'rooms' for the room set and memberships, 'room:<id>' for a room's history.
+# They live in the database so a change made on one worker is seen by all.
+
+def bump(*names):
+    """Invalidate every cache key built from these version counters, commits"""
+    table = CacheVersion.__table__
+    for name in names:
+        increment = table.update().where(table.c.name == name).values(value=table.c.value + 1)
+        if db.session.execute(increment).rowcount:
+            db.session.commit()
+            continue
+        try:
+            db.session.add(CacheVersion(name, 1))
+            db.session.commit()
+        except IntegrityError:
+            # Another worker created it first
+            db.session.rollback()
+            db.session.execute(increment)
+            db.session.commit()
+
+def version(name):
+    """Current value of a version counter, one primary key lookup"""
+    value = db.session.query(CacheVersion.value).filter(CacheVersion.name == name).scalar()
+    return value or 0
+
+def versions(names):
+    """Current values of several version counters in one query, as {name: value}"""
+    rows = dict(db.session.query(CacheVersion.name, CacheVersion.value)
+                .filter(CacheVersion.name.in_(names)))
+    return {name: rows.get(name, 0) for name in names}
+
+class FragmentCache:
+    """Bounded LRU cache of rendered fragments with hit/miss counters.
+
+    Keys embed version counters, so a change makes old entries unreachable
+    and they age out of the LRU. The TTL bounds how stale values that are
+    not versioned (member and message counts) can get.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('FRAGMENT_CACHE_SIZE', self.max_entries)
+        self.ttl = app.config.get('FRAGMENT_CACHE_TTL', self.ttl)
+        self.clear()
+
+    def get_or_render(self, key, render):
+        """Return the cached fragment for key, rendering and storing it on a miss"""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[0] < self.ttl:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        value = render()
+        self._entries[key] = (now, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+fragment_cache = FragmentCache()
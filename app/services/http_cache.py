@@ -0,0 +1,106 @@
+import gzip
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, make_response
+
+def conditional(etag_for):
+    """Decorator adding a weak ETag computed by etag_for(**view_args) to a view.
+
+    The tag is built from version counters before the view runs, so a
+    matching If-None-Match is answered with 304 without running the view's
+    queries or serializing the body. etag_for must check that the resource
+    exists and is readable, returning None to skip validation otherwise.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = etag_for(*args, **kwargs)
+            if etag is not None and request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag, weak=True)
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if etag is not None and response.status_code == 200:
+                response.set_etag(etag, weak=True)
+            return response
+        return decorated_function
+    return decorator
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+class Compressor:
+    """Compresses JSON responses above a size threshold with brotli or gzip.
+
+    Brotli is used when the client accepts it and the brotli package is
+    installed. Compressed bodies of responses carrying an ETag are kept in
+    a small LRU, so hot cached responses are only compressed once.
+    """
+
+    def __init__(self, min_size=1024, cache_size=256):
+        self.min_size = min_size
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._brotli = None
+
+    def init_app(self, app):
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', self.min_size)
+        self.cache_size = app.config.get('COMPRESS_CACHE_SIZE', self.cache_size)
+        self._brotli = _brotli()
+        app.after_request(self.compress_response)
+
+    def _encoding(self):
+        accepted = request.accept_encodings
+        if self._brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def _compress(self, data, encoding):
+        if encoding == 'br':
+            return self._brotli.compress(data, quality=5)
+        return gzip.compress(data, compresslevel=6)
+
+    def compress_response(self, response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or response.mimetype != 'application/json'
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self._encoding()
+        data = response.get_data()
+        if encoding is None or len(data) < self.min_size:
+            return response
+
+        etag, _ = response.get_etag()
+        key = (request.full_path, etag, encoding) if etag else None
+        body = self._cache.get(key) if key else None
+        if body is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            body = self._compress(data, encoding)
+            if key:
+                self._cache[key] = body
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def stats(self):
+        return {'entries': len(self._cache), 'hits': self.hits, 'misses': self.misses,
+                'min_size': self.min_size, 'brotli': self._brotli is not None}
+
+compressor = Compressor()
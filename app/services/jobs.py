@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db, socketio
+from app.models.job import Job, JobStatus
+from app.models.message import Message
+from app.models.room import Room
+from app.models.user import user_rooms
+from app.services.archive import drop_room_archive, redact_user
+from app.services.fragment_cache import bump
+from app.services.revisions import drop_history
+from app.services.changes import forget_room
+
+# Job kind -> handler(job, params, batch_size)
+handlers = {}
+
+class JobCancelled(Exception):
+    pass
+
+def job_handler(kind):
+    """Register a function as the handler of a job kind"""
+    def decorator(f):
+        handlers[kind] = f
+        return f
+    return decorator
+
+def enqueue(kind, params, user_id=None):
+    """Persist a new pending job, the worker picks it up on its next poll"""
+    job = Job(kind, params, created_by=user_id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def notify(job):
+    """Push job progress to the user who started it"""
+    if job.created_by:
+        socketio.emit('job_progress', job.to_dict(), room=f'user_{job.created_by}')
+
+def report_progress(job, done):
+    """Record progress after a chunk, raising JobCancelled if a cancel was requested"""
+    job.progress += done
+    db.session.commit()
+    notify(job)
+
+    db.session.refresh(job)
+    if job.cancel_requested:
+        raise JobCancelled()
+
+    # Let other greenlets run between chunks
+    socketio.sleep(0)
+
+def claim(job_id):
+    """Atomically move a pending job to running, False if another worker got it"""
+    claimed = (Job.query
+               .filter_by(id=job_id, status=JobStatus.PENDING)
+               .update({'status': JobStatus.RUNNING, 'started_at': datetime.utcnow()},
+                       synchronize_session=False))
+    db.session.commit()
+    return claimed == 1
+
+def requeue_stale(app, now=None):
+    """Put running jobs back to pending when their worker stopped reporting progress.
+
+    A job is left running when its worker dies mid-way. Every chunk
+    touches updated_at, so a job silent for JOB_STALE_AFTER seconds is
+    presumed orphaned. Handlers only work on what is left, so rerunning
+    one from the start is safe.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=app.config['JOB_STALE_AFTER'])
+    requeued = (Job.query
+                .filter(Job.status == JobStatus.RUNNING,
+                        db.func.coalesce(Job.updated_at, Job.started_at) < cutoff)
+                .update({'status': JobStatus.PENDING, 'progress': 0},
+                        synchronize_session=False))
+    db.session.commit()
+    if requeued:
+        app.logger.warning('Requeued %d stale jobs', requeued)
+    return requeued
+
+def run_job(app, job_id):
+    """Run one claimed job to completion, failure or cancellation"""
+    job = Job.query.get(job_id)
+    handler = handlers.get(job.kind)
+
+    try:
+        if handler is None:
+            raise ValueError(f'Unknown job kind {job.kind}')
+        handler(job, job.get_params(), app.config['JOB_BATCH_SIZE'])
+        job.status = JobStatus.DONE
+    except JobCancelled:
+        job.status = JobStatus.CANCELLED
+    except Exception as e:
+        db.session.rollback()
+        job = Job.query.get(job_id)
+        job.status = JobStatus.FAILED
+        job.error = str(e)
+        app.logger.exception('Job %s failed', job_id)
+
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    notify(job)
+    return job
+
+def run_pending(app):
+    """Run every pending job in creation order, returns the number run"""
+    ran = 0
+    pending = [job.id for job in
+               Job.query.filter_by(status=JobStatus.PENDING).order_by(Job.id).all()]
+    for job_id in pending:
+        if claim(job_id):
+            run_job(app, job_id)
+            ran += 1
+    return ran
+
+@job_handler('delete_room')
+def delete_room(job, params, batch_size):
+    """Delete a room's messages in chunks, then its memberships, archive and the room itself"""
+    room_id = params['room_id']
+    messages = Message.__table__
+
+    job.total = Message.query.filter_by(room_id=room_id).count()
+    db.session.commit()
+
+    while True:
+        # Newest first, a reply always has a higher id than its parent so it goes before it
+        chunk = (db.select(messages.c.id)
+                 .where(messages.c.room_id == room_id)
+                 .order_by(messages.c.id.desc())
+                 .limit(batch_size))
+        drop_history(chunk)
+        deleted = db.session.execute(messages.delete().where(messages.c.id.in_(chunk))).rowcount
+        if not deleted:
+            break
+        report_progress(job, deleted)
+
+    db.session.execute(user_rooms.delete().where(user_rooms.c.room_id == room_id))
+    db.session.execute(Room.__table__.delete().where(Room.__table__.c.id == room_id))
+    # Syncing clients drop the memberships of deleted rooms themselves
+    forget_room(room_id)
+    db.session.commit()
+    drop_room_archive(current_app, room_id)
+    bump('rooms', f'room:{room_id}')
+
+    socketio.emit('room_deleted', {'room_id': room_id}, room=f'room_{room_id}')
+    socketio.emit('room_deleted', {'room_id': room_id}, room=f'unread_{room_id}')
+
+@job_handler('purge_user_messages')
+def purge_user_messages(job, params, batch_size):
+    """Soft delete every message of a user in chunks, then blank them in the archive"""
+    user_id = params['user_id']
+    messages = Message.__table__
+
+    live = Message.query.filter_by(user_id=user_id, is_deleted=False)
+    job.total = live.count()
+    room_ids = [room_id for room_id, in live.with_entities(Message.room_id).distinct()]
+    db.session.commit()
+
+    try:
+        while True:
+            chunk = (db.select(messages.c.id)
+                     .where(messages.c.user_id == user_id, messages.c.is_deleted == False)
+                     .limit(batch_size))
+            drop_history(chunk)
+            updated = db.session.execute(
+                messages.update()
+                .where(messages.c.id.in_(chunk))
+                .values(is_deleted=True, content='[This message was deleted]',
+                        updated_at=datetime.utcnow())
+            ).rowcount
+            if not updated:
+                break
+            report_progress(job, updated)
+        room_ids.extend(room_id for room_id in redact_user(current_app, user_id)
+                        if room_id not in room_ids)
+    finally:
+        # Rooms may hold cached history with the purged messages even if cancelled.
+        # Committed chunks stay purged, a failed one is rolled back before bumping.
+        db.session.rollback()
+        for room_id in room_ids:
+            bump(f'room:{room_id}')
+            socketio.emit('messages_purged', {'user_id': user_id, 'room_id': room_id},
+                          room=f'room_{room_id}')
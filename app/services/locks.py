@@ -0,0 +1,33 @@
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.lock import Lock
+
+# Identifies this process as a lock holder
+holder = uuid.uuid4().hex
+
+def acquire(name, ttl):
+    """Take or extend the lease on name for ttl seconds, False if another process holds it"""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl)
+    taken = (Lock.query
+             .filter(Lock.name == name, db.or_(Lock.holder == holder, Lock.expires_at < now))
+             .update({'holder': holder, 'expires_at': expires_at}, synchronize_session=False))
+    db.session.commit()
+    if taken:
+        return True
+
+    # No row yet, the primary key lets only one process create it
+    try:
+        db.session.add(Lock(name, holder, expires_at))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+def release(name):
+    """Give up the lease on name if this process holds it"""
+    Lock.query.filter_by(name=name, holder=holder).delete(synchronize_session=False)
+    db.session.commit()
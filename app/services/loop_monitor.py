@@ -0,0 +1,193 @@
+import sys
+import time
+import traceback
+from collections import deque
+from functools import wraps
+from app import socketio
+
+def _real_threading():
+    """The threading module, unpatched even if eventlet monkey patching is on"""
+    if socketio.async_mode == 'eventlet':
+        from eventlet import patcher
+        return patcher.original('threading')
+    import threading
+    return threading
+
+class HandlerStats:
+    __slots__ = ('calls', 'slow', 'total_ms', 'max_ms', 'blocked', 'last_stack')
+
+    def __init__(self):
+        self.calls = 0
+        self.slow = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.blocked = 0
+        self.last_stack = None
+
+    def to_dict(self):
+        return {'calls': self.calls, 'slow': self.slow, 'blocked': self.blocked,
+                'avg_ms': self.total_ms / self.calls if self.calls else 0.0,
+                'max_ms': self.max_ms, 'last_stack': self.last_stack}
+
+class LoopMonitor:
+    """Measures event loop lag and finds the handlers that cause it.
+
+    A greenlet sleeps for LOOP_MONITOR_INTERVAL and records how late it
+    wakes up; that delay is time the hub spent running something that did
+    not yield. A watchdog OS thread notices when the greenlet is overdue by
+    more than LOOP_LAG_THRESHOLD_MS and samples the stack of the hub thread
+    while it is still blocked. The sample is attributed to the Socket.IO
+    event or route whose wrapper frame is on that stack.
+
+    Every event handler and view is also timed, and calls slower than
+    SLOW_HANDLER_MS are counted and logged.
+    """
+
+    def __init__(self, interval=0.5, lag_threshold_ms=100, slow_handler_ms=250, history=120):
+        self.interval = interval
+        self.lag_threshold_ms = lag_threshold_ms
+        self.slow_handler_ms = slow_handler_ms
+        self.lags = deque(maxlen=history)
+        self.stalls = 0
+        self.max_lag_ms = 0.0
+        self.handlers = {}
+        self.logger = None
+        self._heartbeat = None
+        self._sampled = None
+        self._hub_thread_id = None
+        self._monitored_code = None
+        self._tick = None
+
+    def init_app(self, app):
+        self.interval = app.config.get('LOOP_MONITOR_INTERVAL', self.interval)
+        self.lag_threshold_ms = app.config.get('LOOP_LAG_THRESHOLD_MS', self.lag_threshold_ms)
+        self.slow_handler_ms = app.config.get('SLOW_HANDLER_MS', self.slow_handler_ms)
+        self.logger = app.logger
+
+    def instrument(self, app):
+        """Wrap every registered view and Socket.IO event handler with timing"""
+        for endpoint, view in list(app.view_functions.items()):
+            if endpoint != 'static':
+                app.view_functions[endpoint] = self.timed(f'route {endpoint}', view)
+
+        for namespace, events in socketio.server.handlers.items():
+            for event, handler in list(events.items()):
+                events[event] = self.timed(f'event {event}', handler)
+
+    def timed(self, name, f):
+        """Decorator recording the duration of f under name"""
+        @wraps(f)
+        def _monitored(*args, **kwargs):
+            # The watchdog finds this frame on a blocked stack by its code object
+            # and reads the name from its locals
+            monitored_name = name
+            started = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                self.record(monitored_name, (time.perf_counter() - started) * 1000)
+
+        self._monitored_code = _monitored.__code__
+        return _monitored
+
+    def record(self, name, elapsed_ms):
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = HandlerStats()
+        stats.calls += 1
+        stats.total_ms += elapsed_ms
+        stats.max_ms = max(stats.max_ms, elapsed_ms)
+
+        if elapsed_ms >= self.slow_handler_ms:
+            stats.slow += 1
+            if self.logger:
+                self.logger.warning('Slow handler %s took %.0fms', name, elapsed_ms)
+
+    def _blocking_handler(self, frame):
+        """Name of the monitored handler a stack belongs to, if any"""
+        while frame is not None:
+            if frame.f_code is self._monitored_code:
+                return frame.f_locals.get('monitored_name')
+            frame = frame.f_back
+        return None
+
+    def sample(self):
+        """Capture the hub thread's stack and charge it to the handler running there"""
+        frame = sys._current_frames().get(self._hub_thread_id)
+        if frame is None:
+            return None
+
+        name = self._blocking_handler(frame) or 'unknown'
+        stack = ''.join(traceback.format_stack(frame, limit=15))
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = HandlerStats()
+        stats.blocked += 1
+        stats.last_stack = stack
+
+        if self.logger:
+            self.logger.warning('Event loop blocked for over %dms in %s\n%s',
+                                self.lag_threshold_ms, name, stack)
+        return name
+
+    def measure(self):
+        """Sleep one interval on the event loop and record how late we woke up"""
+        self._heartbeat = time.perf_counter()
+        socketio.sleep(self.interval)
+        lag_ms = max(0.0, (time.perf_counter() - self._heartbeat - self.interval) * 1000)
+        self.lags.append(lag_ms)
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+        if lag_ms >= self.lag_threshold_ms:
+            self.stalls += 1
+            if self.logger:
+                self.logger.warning('Event loop lag %.0fms', lag_ms)
+        return lag_ms
+
+    def watch(self):
+        """Watchdog loop, runs in an OS thread so it keeps going while the hub is blocked"""
+        threshold = self.lag_threshold_ms / 1000
+        while True:
+            self._tick.wait(threshold / 2)
+            heartbeat = self._heartbeat
+            if heartbeat is None or heartbeat == self._sampled:
+                continue
+            if time.perf_counter() - heartbeat > self.interval + threshold:
+                # One sample per stall
+                self._sampled = heartbeat
+                self.sample()
+
+    def start(self):
+        """Start the lag greenlet and, under eventlet, the watchdog thread"""
+        threading = _real_threading()
+        self._hub_thread_id = threading.get_ident()
+        self._tick = threading.Event()
+
+        def monitor():
+            while True:
+                self.measure()
+
+        if socketio.async_mode == 'eventlet':
+            threading.Thread(target=self.watch, name='loop-watchdog', daemon=True).start()
+        return socketio.start_background_task(monitor)
+
+    def stats(self):
+        lags = sorted(self.lags)
+        return {
+            'interval': self.interval,
+            'threshold_ms': self.lag_threshold_ms,
+            'last_lag_ms': self.lags[-1] if self.lags else 0.0,
+            'p50_lag_ms': lags[len(lags) // 2] if lags else 0.0,
+            'p99_lag_ms': lags[int(len(lags) * 0.99)] if lags else 0.0,
+            'max_lag_ms': self.max_lag_ms,
+            'stalls': self.stalls
+        }
+
+    def handler_stats(self):
+        """Per-handler timings, the ones that blocked the loop most first"""
+        ranked = sorted(self.handlers.items(),
+                        key=lambda item: (item[1].blocked, item[1].slow, item[1].max_ms),
+                        reverse=True)
+        return [dict(stats.to_dict(), name=name) for name, stats in ranked]
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import tempfile
+from app import db, socketio
+from app.models.blob import Blob
+from app.models.message import Message, MessageType
+from app.models.room import Room
+from app.models.upload import Upload
+from app.models.user import user_rooms
+from app.services.offload import thumbnail_pool
+
+class UploadTooLarge(Exception):
+    pass
+
+def blob_path(app, blob_id):
+    """Content-addressed location of a blob, fanned out over two directory levels"""
+    return os.path.join(app.config['MEDIA_DIR'], blob_id[:2], blob_id[2:4], blob_id)
+
+def thumbnail_path(app, blob_id):
+    return blob_path(app, blob_id) + '.thumb.jpg'
+
+def store_stream(app, stream):
+    """Copy an upload stream to storage chunk by chunk, returning (sha256, size).
+
+    The body is never held in memory: it is hashed while being written to a
+    temporary file, which is then moved to its content address. If a blob
+    with the same hash already exists the temporary file is dropped.
+    """
+    chunk_size = app.config['UPLOAD_CHUNK_SIZE']
+    max_size = app.config['MAX_UPLOAD_SIZE']
+    tmp_dir = os.path.join(app.config['MEDIA_DIR'], 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                f.write(chunk)
+
+        blob_id = digest.hexdigest()
+        path = blob_path(app, blob_id)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return blob_id, size
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def save_upload(app, stream, content_type, filename, user_id):
+    """Store an upload and return the user's Upload, the blob is shared with duplicates"""
+    blob_id, size = store_stream(app, stream)
+
+    blob = Blob.query.get(blob_id)
+    created = blob is None
+    if created:
+        blob = Blob(blob_id, size, content_type, created_by=user_id)
+        db.session.add(blob)
+    upload = Upload(blob_id, user_id, filename)
+    db.session.add(upload)
+    db.session.commit()
+
+    if created and blob.is_image():
+        socketio.start_background_task(generate_thumbnail, app, blob_id)
+    return upload
+
+def readable_filename(user, blob_id):
+    """Name a user knows a blob by, None if they may not read it.
+
+    Uploaders read their own files under their own name. Anyone else needs
+    a message sharing the blob in a room they can read, and gets the name
+    its sender uploaded it under.
+    """
+    own = Upload.query.filter_by(blob_id=blob_id, user_id=user.id).first()
+    if own is not None:
+        return own.filename or blob_id
+
+    member_rooms = db.select(user_rooms.c.room_id).where(user_rooms.c.user_id == user.id)
+    message = (Message.query
+               .join(Room, Room.id == Message.room_id)
+               .filter(Message.content == blob_id,
+                       Message.message_type.in_((MessageType.IMAGE, MessageType.FILE)),
+                       Message.is_deleted == False,
+                       db.or_(Room.is_private == False, Room.id.in_(member_rooms)))
+               .order_by(Message.id)
+               .first())
+    if message is None:
+        return None
+    shared = Upload.query.filter_by(blob_id=blob_id, user_id=message.user_id).first()
+    return (shared.filename if shared else None) or blob_id
+
+def make_thumbnail(src, dst, size, max_pixels):
+    """Write a JPEG thumbnail of src to dst, False when Pillow is unavailable or can't read it"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+
+    # Pillow only warns below twice its limit, check the header ourselves as well
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    try:
+        with Image.open(src) as image:
+            width, height = image.size
+            if width * height > max_pixels:
+                return False
+            image.thumbnail(size)
+            image.convert('RGB').save(dst, 'JPEG', quality=80)
+    except (OSError, Image.DecompressionBombError):
+        return False
+    return True
+
+def generate_thumbnail(app, blob_id):
+    """Render a blob's thumbnail in the thumbnail pool, off the event loop"""
+    with app.app_context():
+        created = thumbnail_pool.run(make_thumbnail, blob_path(app, blob_id),
+                                     thumbnail_path(app, blob_id),
+                                     tuple(app.config['THUMBNAIL_SIZE']),
+                                     app.config['THUMBNAIL_MAX_PIXELS'])
+        if created:
+            Blob.query.filter_by(id=blob_id).update({'has_thumbnail': True})
+            db.session.commit()
+        return created
@@ -0,0 +1,74 @@
+import threading
+import time
+from app import socketio
+
+class OffloadPool:
+    """Runs blocking, CPU-bound calls in real OS threads.
+
+    Under eventlet the call goes through eventlet.tpool so the hub keeps
+    serving other greenlets while it runs. A semaphore caps how many calls
+    run at once; callers past the limit wait in line and the time they
+    spend waiting is tracked in the stats.
+    """
+
+    def __init__(self, name, limit=4):
+        self.name = name
+        self.limit = limit
+        self._semaphore = None
+        self._stats = {'queued': 0, 'running': 0, 'completed': 0, 'failed': 0,
+                       'total_wait_ms': 0.0, 'max_wait_ms': 0.0}
+
+    def init_app(self, app, config_key):
+        self.limit = app.config.get(config_key, self.limit)
+        self._semaphore = None
+
+    def _get_semaphore(self):
+        # Created lazily, the async mode is only known once socketio is set up
+        if self._semaphore is None:
+            if socketio.async_mode == 'eventlet':
+                from eventlet.semaphore import Semaphore
+                self._semaphore = Semaphore(self.limit)
+            else:
+                self._semaphore = threading.BoundedSemaphore(self.limit)
+        return self._semaphore
+
+    def run(self, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) off the event loop and return its result"""
+        semaphore = self._get_semaphore()
+        queued_at = time.perf_counter()
+        self._stats['queued'] += 1
+        semaphore.acquire()
+        try:
+            wait_ms = (time.perf_counter() - queued_at) * 1000
+            self._stats['queued'] -= 1
+            self._stats['running'] += 1
+            self._stats['total_wait_ms'] += wait_ms
+            self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], wait_ms)
+
+            if socketio.async_mode == 'eventlet':
+                from eventlet import tpool
+                result = tpool.execute(fn, *args, **kwargs)
+            else:
+                # Threading mode already runs every handler in its own thread
+                result = fn(*args, **kwargs)
+
+            self._stats['completed'] += 1
+            return result
+        except Exception:
+            self._stats['failed'] += 1
+            raise
+        finally:
+            self._stats['running'] -= 1
+            semaphore.release()
+
+    def stats(self):
+        """Snapshot of the queueing metrics"""
+        stats = dict(self._stats, name=self.name, limit=self.limit)
+        finished = stats['completed'] + stats['failed']
+        stats['avg_wait_ms'] = stats['total_wait_ms'] / finished if finished else 0.0
+        return stats
+
+# Password hashing is the main CPU hog on the auth endpoints
+hash_pool = OffloadPool('hashing')
+# Image decoding and resizing for media thumbnails
+thumbnail_pool = OffloadPool('thumbnails', limit=2)
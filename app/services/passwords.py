@@ -0,0 +1,35 @@
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.services.offload import hash_pool
+
+DEFAULT_METHOD = 'pbkdf2:sha256:600000'
+
+# Configured method -> the full prefix werkzeug writes for it
+_prefixes = {}
+
+def hash_method():
+    """Hashing parameters new hashes should use"""
+    if has_app_context():
+        return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+    return DEFAULT_METHOD
+
+def hash_password(password):
+    """Hash a password in the hashing pool"""
+    return hash_pool.run(generate_password_hash, password, method=hash_method())
+
+def verify_password(password_hash, password):
+    """Check a password against its hash in the hashing pool"""
+    return hash_pool.run(check_password_hash, password_hash, password)
+
+def method_prefix(method):
+    """Stored form of a hashing method, short names like 'scrypt' get their defaults filled in"""
+    prefix = _prefixes.get(method)
+    if prefix is None:
+        # Hash a probe once per method, werkzeug is the only source of its defaults
+        probe = hash_pool.run(generate_password_hash, '', method=method)
+        prefix = _prefixes[method] = probe.split('$', 1)[0]
+    return prefix
+
+def needs_rehash(password_hash):
+    """True if the hash was made with other parameters than the configured ones"""
+    return password_hash.split('$', 1)[0] != method_prefix(hash_method())
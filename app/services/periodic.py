@@ -0,0 +1,18 @@
+from app import db, socketio
+
+def start_periodic(app, name, interval, task):
+    """Call task() in an app context every interval seconds in a background task.
+
+    A failing run is rolled back and logged, the next one still happens.
+    """
+    def worker():
+        while True:
+            socketio.sleep(interval)
+            with app.app_context():
+                try:
+                    task()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception('%s failed', name)
+
+    return socketio.start_background_task(worker)
@@ -0,0 +1,13 @@
+from app.models.user import User, user_rooms
+
+def online_members(room_id, page=1, per_page=50):
+    """Paginate the online members of a room with one indexed query.
+
+    Joins user_rooms (indexed by room) with users filtered on is_online, so
+    only the requested page is loaded however many members the room has.
+    """
+    return (User.query
+            .join(user_rooms, user_rooms.c.user_id == User.id)
+            .filter(user_rooms.c.room_id == room_id, User.is_online == True)
+            .order_by(User.username)
+            .paginate(page=page, per_page=per_page, error_out=False))
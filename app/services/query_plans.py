@@ -0,0 +1,63 @@
+from datetime import datetime
+from app import db
+from app.models.user import User, user_rooms
+from app.models.room import Room
+from app.models.message import Message
+
+def hot_queries():
+    """The queries behind chat, admin and socket handlers, by name"""
+    now = datetime.utcnow()
+    return {
+        'chat.room history': Message.query.filter_by(room_id=1, parent_id=None)
+            .order_by(Message.id.desc()).limit(100),
+        'chat.room_history before': Message.query.filter_by(room_id=1, parent_id=None)
+            .filter(Message.id < 1000).order_by(Message.id.desc()).limit(50),
+        'chat.index public rooms': Room.query.filter_by(is_private=False),
+        'chat.index private rooms': Room.query.join(user_rooms)
+            .filter(user_rooms.c.user_id == 1, Room.is_private == True),
+        'chat.create_room name lookup': Room.query.filter_by(name='General').limit(1),
+        'room members': User.query.join(user_rooms).filter(user_rooms.c.room_id == 1),
+        'room is_member': User.query.join(user_rooms)
+            .filter(user_rooms.c.room_id == 1, User.id == 1).limit(1),
+        'room message_count': db.session.query(db.func.count(Message.id)).filter(Message.room_id == 1),
+        'message replies': Message.query.filter_by(parent_id=1),
+        'user messages': Message.query.filter_by(user_id=1),
+        'unread counts': db.session.query(user_rooms.c.room_id, db.func.count(Message.id))
+            .select_from(user_rooms)
+            .outerjoin(Message, db.and_(
+                Message.room_id == user_rooms.c.room_id,
+                Message.id > db.func.coalesce(user_rooms.c.last_read_message_id, 0)))
+            .filter(user_rooms.c.user_id == 1).group_by(user_rooms.c.room_id),
+        'admin.dashboard online users': db.session.query(db.func.count(User.id))
+            .filter(User.is_online == True),
+        'admin.users': User.query.order_by(User.created_at.desc()).limit(20),
+        'admin.rooms': Room.query.order_by(Room.created_at.desc()).limit(20),
+        'admin.messages': Message.query.order_by(Message.created_at.desc()).limit(50),
+        'admin.messages by room': Message.query.filter_by(room_id=1)
+            .order_by(Message.created_at.desc()).limit(50),
+        'retention archive batch': Message.query
+            .filter(Message.room_id == 1, Message.created_at < now)
+            .order_by(Message.id).limit(1000),
+        'retention purge': Message.query
+            .filter(Message.is_deleted == True, Message.updated_at < now),
+    }
+
+def explain(query):
+    """EXPLAIN QUERY PLAN detail lines for an ORM query (SQLite only)"""
+    statement = query.statement if hasattr(query, 'statement') else query
+    sql = str(statement.compile(dialect=db.engine.dialect,
+                                compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql))
+    return [row[-1] for row in rows]
+
+def full_scans(plan):
+    """Plan lines that read a whole table without any index"""
+    return [line for line in plan if line.startswith('SCAN') and 'INDEX' not in line]
+
+def check_query_plans():
+    """Explain every hot query, returning {name: (plan, full_scans)}"""
+    results = {}
+    for name, query in hot_queries().items():
+        plan = explain(query)
+        results[name] = (plan, full_scans(plan))
+    return results
@@ -0,0 +1,84 @@
+import time
+from collections import Counter
+
+class TokenBucket:
+    """Token bucket refilled lazily from the time of its last use"""
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+class RateLimiter:
+    """In-memory token buckets keyed by event, scope ('user', 'sid', 'room') and id.
+
+    Limits come from RATE_LIMITS, e.g. {'send_message': {'user': (1, 5)}}
+    allows one send_message per second per user with bursts of five. A
+    bucket that has been idle long enough to refill completely is the same
+    as no bucket, so idle buckets are dropped in periodic sweeps.
+    """
+
+    def __init__(self, sweep_every=1000):
+        self.limits = {}
+        self.sweep_every = sweep_every
+        self.rejections = Counter()
+        self._buckets = {}
+        self._calls = 0
+
+    def init_app(self, app):
+        self.limits = app.config.get('RATE_LIMITS', {})
+
+    def allow(self, event, keys):
+        """Take a token from every bucket of event for keys ({scope: id}).
+
+        Returns the scope that ran out, or None if the call is allowed.
+        Tokens are only taken when every bucket has one.
+        """
+        limits = self.limits.get(event)
+        if not limits:
+            return None
+
+        now = time.monotonic()
+        self._calls += 1
+        if self._calls % self.sweep_every == 0:
+            self.sweep(now)
+
+        buckets = []
+        for scope, (rate, burst) in limits.items():
+            key = keys.get(scope)
+            if key is None:
+                continue
+
+            bucket = self._buckets.get((event, scope, key))
+            if bucket is None:
+                bucket = self._buckets[(event, scope, key)] = TokenBucket(burst, now)
+            else:
+                bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+                bucket.updated = now
+
+            if bucket.tokens < 1:
+                self.rejections[(event, scope)] += 1
+                return scope
+            buckets.append(bucket)
+
+        for bucket in buckets:
+            bucket.tokens -= 1
+        return None
+
+    def sweep(self, now=None):
+        """Drop buckets that would be full again by now"""
+        now = now or time.monotonic()
+        for key, bucket in list(self._buckets.items()):
+            event, scope, _ = key
+            rate, burst = self.limits[event][scope]
+            if bucket.tokens + (now - bucket.updated) * rate >= burst:
+                del self._buckets[key]
+
+    def stats(self):
+        """Rejection counts per event and scope plus the number of live buckets"""
+        rejections = {}
+        for (event, scope), count in self.rejections.items():
+            rejections.setdefault(event, {})[scope] = count
+        return {'buckets': len(self._buckets), 'rejections': rejections}
+
+rate_limiter = RateLimiter()
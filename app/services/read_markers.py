@@ -0,0 +1,58 @@
+from app import db
+from app.models.user import user_rooms
+from app.models.message import Message
+
+# Latest read message per (user_id, room_id), waiting to be written
+pending_markers = {}
+
+def mark_read(user_id, room_id, message_id):
+    """Buffer a read marker, only the highest message id per room is kept"""
+    key = (int(user_id), int(room_id))
+    if message_id > pending_markers.get(key, 0):
+        pending_markers[key] = message_id
+
+def flush(user_id=None):
+    """Write buffered read markers in one executemany UPDATE, all users' or only one's"""
+    keys = [key for key in pending_markers if user_id is None or key[0] == user_id]
+    if not keys:
+        return 0
+
+    rows = [{'uid': key[0], 'rid': key[1], 'mid': pending_markers.pop(key)} for key in keys]
+
+    # Never move a marker backwards
+    stmt = (user_rooms.update()
+            .where(user_rooms.c.user_id == db.bindparam('uid'),
+                   user_rooms.c.room_id == db.bindparam('rid'),
+                   db.or_(user_rooms.c.last_read_message_id.is_(None),
+                          user_rooms.c.last_read_message_id < db.bindparam('mid')))
+            .values(last_read_message_id=db.bindparam('mid')))
+    db.session.execute(stmt, rows)
+    db.session.commit()
+    return len(rows)
+
+def unread_counts(user_id):
+    """Unread message count for every room of a user, as {room_id: count}, in one query"""
+    flush(user_id)
+    rows = (db.session.query(user_rooms.c.room_id, db.func.count(Message.id))
+            .select_from(user_rooms)
+            .outerjoin(Message, db.and_(
+                Message.room_id == user_rooms.c.room_id,
+                # Markers start at the newest message on join, NULL means the room was empty then
+                Message.id > db.func.coalesce(user_rooms.c.last_read_message_id, 0),
+                Message.user_id != user_rooms.c.user_id,
+                Message.is_deleted == False))
+            .filter(user_rooms.c.user_id == user_id)
+            .group_by(user_rooms.c.room_id)
+            .all())
+    return {room_id: count for room_id, count in rows}
+
+def read_positions(user_id):
+    """Read marker of every room a user belongs to, as {room_id: message_id or None}"""
+    rows = (db.session.query(user_rooms.c.room_id, user_rooms.c.last_read_message_id)
+            .filter(user_rooms.c.user_id == user_id))
+    return dict(rows.all())
+
+def member_room_ids(user_id):
+    """Ids of the rooms a user belongs to, without loading the rooms"""
+    rows = db.session.query(user_rooms.c.room_id).filter(user_rooms.c.user_id == user_id)
+    return [room_id for room_id, in rows]
@@ -0,0 +1,87 @@
+import json
+from difflib import SequenceMatcher
+from flask import current_app
+from app import db
+from app.models.revision import MessageRevision
+
+def make_delta(old, new):
+    """Edits turning old into new, as [start, end, text] replacements of old's slices"""
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+    return [[i1, i2, new[j1:j2]]
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+def apply_delta(text, delta):
+    """Apply a delta from make_delta to the text it was computed against"""
+    parts = []
+    pos = 0
+    for start, end, replacement in delta:
+        parts.append(text[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+def encode(delta):
+    return json.dumps(delta, separators=(',', ':'))
+
+def edit_message(message, new_content, user_id=None):
+    """Edit a message, keeping its previous content as a reverse delta.
+
+    Only the current content is stored in full. Each revision row holds the
+    edits that turn the next revision back into it, so older revisions are
+    rebuilt by walking back from the current content. Returns the forward
+    delta from the previous revision to the new one, for broadcasting.
+    """
+    old_content = message.content
+    db.session.add(MessageRevision(message.id, message.revision,
+                                   encode(make_delta(new_content, old_content)),
+                                   edited_by=user_id))
+    message.edit(new_content)
+    compact(message)
+    return make_delta(old_content, new_content)
+
+def compact(message):
+    """Drop revisions past MESSAGE_REVISION_LIMIT, oldest first.
+
+    Reverse deltas only depend on newer revisions, so dropping the oldest
+    ones never breaks the reconstruction of the rest.
+    """
+    limit = current_app.config['MESSAGE_REVISION_LIMIT']
+    return (MessageRevision.query
+            .filter(MessageRevision.message_id == message.id,
+                    MessageRevision.revision < message.revision - limit)
+            .delete(synchronize_session=False))
+
+def revisions(message):
+    """Metadata of the retained revisions of a message, newest first"""
+    return (MessageRevision.query
+            .filter_by(message_id=message.id)
+            .order_by(MessageRevision.revision.desc())
+            .all())
+
+def content_at(message, revision):
+    """Content of a message at a revision, None if it was compacted away or never existed"""
+    if revision == message.revision:
+        return message.content
+    if revision < 0 or revision > message.revision:
+        return None
+
+    deltas = (db.session.query(MessageRevision.revision, MessageRevision.delta)
+              .filter(MessageRevision.message_id == message.id,
+                      MessageRevision.revision >= revision)
+              .order_by(MessageRevision.revision.desc())
+              .all())
+    if len(deltas) != message.revision - revision:
+        return None
+
+    content = message.content
+    for _, delta in deltas:
+        content = apply_delta(content, json.loads(delta))
+    return content
+
+def drop_history(message_ids):
+    """Delete the revisions of messages being deleted, message_ids may be a subquery"""
+    return db.session.execute(
+        MessageRevision.__table__.delete()
+        .where(MessageRevision.__table__.c.message_id.in_(message_ids))
+    ).rowcount
@@ -0,0 +1,142 @@
+import random
+from collections import deque
+from datetime import datetime, timedelta
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models.user import User, user_rooms
+from app.models.room import Room
+from app.models.message import Message, MessageType
+
+WORDS = ('hey hello thanks yes no maybe today tomorrow deploy build test bug fix '
+         'release room chat message server client socket database query index '
+         'cache latency review merge branch ticket meeting lunch coffee weekend '
+         'great awesome sure ok lol nice question answer help please').split()
+
+def _max_id(column):
+    return db.session.query(db.func.max(column)).scalar() or 0
+
+def _insert(table, rows):
+    if rows:
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+        rows.clear()
+
+def _text(rng, max_length):
+    """Random message text with a long-tailed (log-normal) length"""
+    length = min(max_length, max(1, int(rng.lognormvariate(3.5, 0.9))))
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length]
+
+def generate_dataset(users=1000, rooms=100, messages=100000, private_ratio=0.2,
+                     rooms_per_user=5, reply_ratio=0.15, deleted_ratio=0.02,
+                     days=365, seed=42, batch_size=10000, max_length=500, report=None):
+    """Bulk insert a synthetic, reproducible dataset.
+
+    The same arguments and seed always produce the same rows. Inserts go
+    through Core executemany in batches so large volumes stay fast. Room
+    traffic follows a Zipf-like curve, message gaps are exponential and
+    roughly reply_ratio of messages answer a recent message in the same room.
+    Timestamps span the days before today; everything else depends only on
+    the seed.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = now - timedelta(days=days)
+
+    # Hashing is slow, every synthetic user shares one password
+    password_hash = generate_password_hash('perf-password')
+
+    first_user = _max_id(User.id) + 1
+    first_room = _max_id(Room.id) + 1
+    first_message = _max_id(Message.id) + 1
+
+    # Users
+    batch = []
+    for n in range(users):
+        user_id = first_user + n
+        batch.append({
+            'id': user_id,
+            'username': f'perf_user_{user_id}',
+            'email': f'perf_user_{user_id}@example.com',
+            'password_hash': password_hash,
+            'is_online': rng.random() < 0.05,
+            'created_at': start + timedelta(seconds=rng.randrange(days * 86400)),
+        })
+        if len(batch) >= batch_size:
+            _insert(User.__table__, batch)
+    _insert(User.__table__, batch)
+
+    # Rooms, the first one is public so everyone has a common room
+    room_ids = [first_room + n for n in range(rooms)]
+    private = {room_id for room_id in room_ids[1:] if rng.random() < private_ratio}
+    batch = [{
+        'id': room_id,
+        'name': f'perf_room_{room_id}',
+        'description': f'Synthetic room {room_id}',
+        'is_private': room_id in private,
+        'owner_id': first_user + rng.randrange(users),
+        'created_at': start,
+    } for room_id in room_ids]
+    _insert(Room.__table__, batch)
+
+    # Memberships
+    members = {room_id: [] for room_id in room_ids}
+    batch = []
+    for n in range(users):
+        user_id = first_user + n
+        joined = {room_ids[0]} | set(rng.sample(room_ids, min(rooms_per_user, rooms)))
+        for room_id in joined:
+            members[room_id].append(user_id)
+            batch.append({'user_id': user_id, 'room_id': room_id, 'joined_at': start})
+        if len(batch) >= batch_size:
+            _insert(user_rooms, batch)
+    _insert(user_rooms, batch)
+
+    # Messages, busy rooms get most of the traffic
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(rooms)]
+    cum_weights = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cum_weights.append(total)
+    mean_gap = days * 86400 / max(messages, 1)
+    recent = {room_id: deque(maxlen=20) for room_id in room_ids}
+
+    created_at = start
+    batch = []
+    for n in range(messages):
+        message_id = first_message + n
+        room_id = rng.choices(room_ids, cum_weights=cum_weights)[0]
+        created_at += timedelta(seconds=rng.expovariate(1 / mean_gap))
+
+        parent_id = None
+        if recent[room_id] and rng.random() < reply_ratio:
+            parent_id = rng.choice(recent[room_id])
+        else:
+            recent[room_id].append(message_id)
+
+        is_deleted = rng.random() < deleted_ratio
+        batch.append({
+            'id': message_id,
+            'content': '[This message was deleted]' if is_deleted else _text(rng, max_length),
+            'message_type': MessageType.TEXT,
+            'user_id': rng.choice(members[room_id] or [first_user]),
+            'room_id': room_id,
+            'parent_id': parent_id,
+            'created_at': created_at,
+            'updated_at': created_at,
+            'is_edited': False,
+            'is_deleted': is_deleted,
+        })
+        if len(batch) >= batch_size:
+            _insert(Message.__table__, batch)
+            if report:
+                report(n + 1)
+    _insert(Message.__table__, batch)
+
+    return {'users': users, 'rooms': rooms, 'private_rooms': len(private), 'messages': messages}
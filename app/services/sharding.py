@@ -0,0 +1,175 @@
+import bisect
+import hashlib
+from collections import deque
+from app import db, socketio
+from app.models.shard import ShardWorker
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+class HashRing:
+    """Consistent hash ring mapping keys to nodes.
+
+    Every node is placed at `replicas` points on the ring and a key belongs
+    to the first point at or after its hash. Adding or removing a node only
+    moves the keys of the arcs next to that node's points, about 1/N of all
+    keys, and leaves the rest where they were.
+    """
+
+    def __init__(self, nodes=(), replicas=100):
+        self.replicas = replicas
+        self.nodes = []
+        self._points = []
+        self._owners = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.replicas):
+            point = _hash(f'{node}#{i}')
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+                self._owners[point] = node
+
+    def remove(self, node):
+        self.nodes.remove(node)
+        self._points = [point for point in self._points if self._owners[point] != node]
+        self._owners = {point: self._owners[point] for point in self._points}
+
+    def owner(self, key):
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(str(key))) % len(self._points)
+        return self._owners[self._points[index]]
+
+class RoomState:
+    """In-memory state of a room, kept by the worker that owns it"""
+    __slots__ = ('recent', 'members')
+
+    def __init__(self, recent_size):
+        self.recent = deque(maxlen=recent_size)
+        # user_id -> sids connected to this room
+        self.members = {}
+
+    def add_message(self, message):
+        self.recent.append(message)
+
+    def update_message(self, message):
+        for index, recent in enumerate(self.recent):
+            if recent['id'] == message['id']:
+                self.recent[index] = message
+                return
+
+    def join(self, user_id, sid):
+        self.members.setdefault(user_id, set()).add(sid)
+
+    def leave(self, user_id, sid):
+        sids = self.members.get(user_id)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self.members[user_id]
+
+class ShardRouter:
+    """Assigns rooms to Socket.IO workers with a consistent hash ring.
+
+    With SHARD_WORKERS set, every worker builds the same ring from the list
+    and only serves the rooms it owns. Clients are told to reconnect to the
+    owner with a room_redirect event, so all sockets of a room end up on one
+    worker, broadcasts stay local and no message queue is needed. The
+    owner's RoomState is then the authoritative view of the room. Without
+    SHARD_WORKERS every room is local and no state is kept.
+
+    A list saved with save_workers overrides SHARD_WORKERS. Every worker
+    polls it and rebalances when it changes, so all rings stay the same.
+    """
+
+    def __init__(self):
+        self.self_url = None
+        self.recent_size = 50
+        self.ring = HashRing()
+        self.rooms = {}
+
+    def init_app(self, app):
+        self.self_url = app.config.get('SHARD_SELF')
+        self.recent_size = app.config.get('SHARD_RECENT_MESSAGES', self.recent_size)
+        workers = app.config.get('SHARD_WORKERS', [])
+        # A worker missing from the ring would redirect every client away
+        if workers and self.self_url not in workers:
+            raise ValueError(f'SHARD_SELF {self.self_url!r} must be one of SHARD_WORKERS')
+        self.ring = HashRing(workers)
+
+    @property
+    def enabled(self):
+        return bool(self.ring.nodes)
+
+    def owner(self, room_id):
+        """URL of the worker owning a room, None when sharding is off"""
+        return self.ring.owner(int(room_id)) if self.enabled else None
+
+    def owns(self, room_id):
+        return not self.enabled or self.owner(room_id) == self.self_url
+
+    def get(self, room_id):
+        """State of a room held by this worker, None if it has none"""
+        return self.rooms.get(int(room_id))
+
+    def state(self, room_id, load=None):
+        """Owned room's state, created on first use with load() giving its recent messages"""
+        room_id = int(room_id)
+        state = self.rooms.get(room_id)
+        if state is None:
+            state = self.rooms[room_id] = RoomState(self.recent_size)
+            for message in load() if load else ():
+                state.add_message(message)
+        return state
+
+    def set_workers(self, workers):
+        """Rebuild the ring for a new worker list, returns the ids of rooms that moved away"""
+        self.ring = HashRing(workers, self.ring.replicas)
+        moved = [room_id for room_id in self.rooms if not self.owns(room_id)]
+        for room_id in moved:
+            del self.rooms[room_id]
+        return moved
+
+    def rebalance(self, workers):
+        """Switch to a new worker list and send the clients of moved rooms to their new owner"""
+        moved = self.set_workers(workers)
+        for room_id in moved:
+            socketio.emit('room_redirect', {'room_id': room_id, 'worker': self.owner(room_id)},
+                          room=f'room_{room_id}')
+            socketio.close_room(f'room_{room_id}')
+        return moved
+
+    def load_workers(self, default=()):
+        """Shared worker list from the database, default when none was saved"""
+        workers = [worker.url for worker in ShardWorker.query.order_by(ShardWorker.position)]
+        return workers or list(default)
+
+    def save_workers(self, workers):
+        """Replace the shared worker list, every worker picks it up on its next reload"""
+        ShardWorker.query.delete()
+        db.session.add_all(ShardWorker(url, position) for position, url in enumerate(workers))
+        db.session.commit()
+
+    def reload(self, app):
+        """Rebalance if the shared worker list changed, returns the ids of rooms that moved away"""
+        workers = self.load_workers(app.config['SHARD_WORKERS'])
+        if workers == self.ring.nodes:
+            return []
+        app.logger.info('Shard workers changed to %s', workers)
+        return self.rebalance(workers)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'self': self.self_url,
+            'workers': self.ring.nodes,
+            'rooms': {room_id: {'members': len(state.members), 'recent': len(state.recent)}
+                      for room_id, state in self.rooms.items()}
+        }
+
+shard_router = ShardRouter()
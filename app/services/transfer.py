@@ -0,0 +1,108 @@
+import json
+import os
+from datetime import datetime
+from app import db
+from app.models.user import User, user_rooms
+from app.models.room import Room
+from app.models.message import Message
+from app.models.blob import Blob
+from app.models.upload import Upload
+from app.models.revision import MessageRevision
+
+# Tables in foreign key order, so an import never references a missing row.
+# Blob rows only describe uploads, the files in MEDIA_DIR are copied separately.
+EXPORT_TABLES = [User.__table__, Blob.__table__, Upload.__table__, Room.__table__, user_rooms,
+                 Message.__table__, MessageRevision.__table__]
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def export_ndjson(out, batch_size=1000):
+    """Stream every exported table to out as one JSON object per line.
+
+    Rows are fetched with a server-side cursor in batches, so memory stays
+    constant regardless of table size. Returns the number of rows written.
+    """
+    written = 0
+    for table in EXPORT_TABLES:
+        query = db.select(table).order_by(*table.primary_key.columns)
+        result = db.session.execute(query.execution_options(yield_per=batch_size))
+        for partition in result.partitions():
+            for row in partition:
+                record = {key: _encode(value) for key, value in row._mapping.items()}
+                out.write(json.dumps({'table': table.name, 'row': record},
+                                     separators=(',', ':')) + '\n')
+            written += len(partition)
+    return written
+
+def _decoder(table):
+    """Build a function that turns an exported record back into column values"""
+    datetime_columns = [c.name for c in table.columns
+                        if isinstance(c.type, db.DateTime)]
+
+    def decode(record):
+        for name in datetime_columns:
+            if record.get(name):
+                record[name] = datetime.fromisoformat(record[name])
+        return record
+    return decode
+
+def _read_checkpoint(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return int(f.read().strip() or 0)
+
+def _write_checkpoint(path, line_no):
+    with open(path, 'w') as f:
+        f.write(str(line_no))
+
+def import_ndjson(path, batch_size=5000, resume=True):
+    """Load an export produced by export_ndjson with batched executemany inserts.
+
+    Inserts go through Core, bypassing ORM instances and events. After every
+    committed batch the line number is written to '<path>.checkpoint' so an
+    interrupted import can resume where it stopped. Returns the number of
+    rows inserted by this run.
+    """
+    tables = {table.name: table for table in EXPORT_TABLES}
+    decoders = {name: _decoder(table) for name, table in tables.items()}
+    checkpoint_path = path + '.checkpoint'
+    skip = _read_checkpoint(checkpoint_path) if resume else 0
+
+    inserted = 0
+    pending_table = None
+    batch = []
+
+    def flush(line_no):
+        nonlocal inserted
+        if batch:
+            db.session.execute(tables[pending_table].insert(), batch)
+            db.session.commit()
+            inserted += len(batch)
+            batch.clear()
+        _write_checkpoint(checkpoint_path, line_no)
+
+    line_no = 0
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            if line_no <= skip or not line.strip():
+                continue
+
+            entry = json.loads(line)
+            name = entry['table']
+            if name not in tables:
+                continue
+
+            # Flush before switching tables to keep foreign key order
+            if name != pending_table or len(batch) >= batch_size:
+                flush(line_no - 1)
+                pending_table = name
+
+            batch.append(decoders[name](entry['row']))
+
+    flush(line_no)
+    os.remove(checkpoint_path)
+    return inserted
@@ -1,10 +1,19 @@
+from functools import wraps
+from flask import current_app, request, session
 from flask_socketio import emit, join_room, leave_room, disconnect
 from flask_login import current_user
 from app import socketio, db
 from app.models.message import Message, MessageType
 from app.models.room import Room
-from app.models.user import User
-import bleach
+from app.models.user import User, user_rooms
+from app.services.ratelimit import rate_limiter
+from app.services.read_markers import mark_read, member_room_ids
+from app.services.presence import online_members
+from app.services.fragment_cache import bump
+from app.services.revisions import edit_message, encode, drop_history
+from app.services.sharding import shard_router
+from app.services.media import readable_filename
+from app.services.changes import changes_since
 from datetime import datetime
 
 # Store connected users
@@ -13,9 +22,55 @@ typing_users = {}
 
 def sanitize_input(text):
     """Sanitize input to prevent XSS attacks"""
+    import bleach  # deferred, bleach is slow to import
     allowed_tags = ['b', 'i', 'u', 'em', 'strong', 'code', 'pre']
     return bleach.clean(text, tags=allowed_tags, strip=True)
 
+def rate_limited(event):
+    """Decorator that rejects an event over its rate limit before any DB query"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(data=None, *args):
+            # Read the user id from the session, current_user would hit the DB
+            keys = {
+                'user': session.get('_user_id'),
+                'sid': request.sid,
+                'room': data.get('room_id') if isinstance(data, dict) else None
+            }
+            if rate_limiter.allow(event, keys):
+                emit('error', {'message': 'Rate limit exceeded', 'event': event})
+                return
+            return f(data, *args)
+        return decorated_function
+    return decorator
+
+def redirect_to_owner(room_id):
+    """Send the client to the worker owning a room, True if the event must not be handled here"""
+    try:
+        if shard_router.owns(room_id):
+            return False
+    except (TypeError, ValueError):
+        emit('error', {'message': 'Invalid room ID'})
+        return True
+    emit('room_redirect', {'room_id': room_id, 'worker': shard_router.owner(room_id)})
+    return True
+
+def int_arg(data, key, default):
+    """Integer event argument, default when missing or not a number"""
+    try:
+        return int(data.get(key, default))
+    except (TypeError, ValueError):
+        return default
+
+def recent_messages(room_id):
+    """Latest top-level messages of a room, to seed its in-memory state"""
+    messages = (Message.query
+                .filter_by(room_id=room_id, parent_id=None)
+                .order_by(Message.id.desc())
+                .limit(shard_router.recent_size)
+                .all())
+    return [message.to_dict() for message in reversed(messages)]
+
 @socketio.on('connect')
 def on_connect():
     """Handle user connection"""
@@ -27,6 +82,13 @@ def on_connect():
             'connected_at': datetime.utcnow()
         }
         
+        # Personal channel for notifications such as job progress
+        join_room(f'user_{current_user.id}')
+        
+        # Subscribe to unread updates for every room the user belongs to
+        for room_id in member_room_ids(current_user.id):
+            join_room(f'unread_{room_id}')
+        
         # Update user online status
         current_user.is_online = True
         current_user.last_seen = datetime.utcnow()
@@ -51,6 +113,10 @@ def on_disconnect():
         if current_user.id in connected_users:
             del connected_users[current_user.id]
         
+        # Leave the rooms this worker owns
+        for state in shard_router.rooms.values():
+            state.leave(current_user.id, request.sid)
+        
         # Remove from typing users
         for room_id in list(typing_users.keys()):
             if current_user.id in typing_users[room_id]:
@@ -94,8 +160,23 @@ def on_join_room(data):
         emit('error', {'message': 'Access denied to this room'})
         return
     
+    if redirect_to_owner(room_id):
+        return
+    
     # Join the Socket.IO room
     join_room(f'room_{room_id}')
+    join_room(f'unread_{room_id}')
+    
+    # The owning worker's state is authoritative, send it to the new member
+    if shard_router.enabled:
+        state = shard_router.state(room_id, load=lambda: recent_messages(room_id))
+        state.join(current_user.id, request.sid)
+        emit('room_state', {
+            'room_id': room_id,
+            'messages': list(state.recent),
+            'members': list(state.members),
+            'typing_users': [User.query.get(uid).username for uid in typing_users.get(room_id, [])]
+        })
     
     # Notify others in the room
     emit('user_joined', {
@@ -122,6 +203,9 @@ def on_leave_room(data):
     
     # Leave the Socket.IO room
     leave_room(f'room_{room_id}')
+    state = shard_router.get(room_id)
+    if state is not None:
+        state.leave(current_user.id, request.sid)
     
     # Remove from typing users
     if room_id in typing_users and current_user.id in typing_users[room_id]:
@@ -141,6 +225,7 @@ def on_leave_room(data):
     print(f"User {current_user.username} left room {room.name}")
 
 @socketio.on('send_message')
+@rate_limited('send_message')
 def on_send_message(data):
     """Handle sending a message"""
     if not current_user.is_authenticated:
@@ -149,16 +234,34 @@ def on_send_message(data):
     room_id = data.get('room_id')
     content = data.get('content', '').strip()
     parent_id = data.get('parent_id')  # For replies
+    message_type = data.get('message_type', MessageType.TEXT)
+    
+    if message_type not in (MessageType.TEXT, MessageType.IMAGE, MessageType.FILE):
+        emit('error', {'message': 'Invalid message type'})
+        return
+    
+    # Image and file messages reference an uploaded blob instead of inline content
+    is_media = message_type != MessageType.TEXT
+    if is_media:
+        content = data.get('blob_id') or ''
     
     if not room_id or not content:
         emit('error', {'message': 'Missing room ID or message content'})
         return
     
+    if redirect_to_owner(room_id):
+        return
+    
     # Validate message length
     if len(content) > 500:  # MAX_MESSAGE_LENGTH from config
         emit('error', {'message': 'Message too long'})
         return
     
+    # Posting a hash must not grant access to a file the sender can't read
+    if is_media and readable_filename(current_user, content) is None:
+        emit('error', {'message': 'File not found'})
+        return
+    
     room = Room.query.get(room_id)
     if not room:
         emit('error', {'message': 'Room not found'})
@@ -170,18 +273,21 @@ def on_send_message(data):
         return
     
     # Sanitize message content
-    content = sanitize_input(content)
+    if not is_media:
+        content = sanitize_input(content)
     
     # Create and save message
     message = Message(
         content=content,
         user_id=current_user.id,
         room_id=room_id,
+        message_type=message_type,
         parent_id=parent_id
     )
     
     db.session.add(message)
     db.session.commit()
+    bump(f'room:{room_id}')
     
     # Remove user from typing if they were typing
     if room_id in typing_users and current_user.id in typing_users[room_id]:
@@ -192,18 +298,68 @@ def on_send_message(data):
         }, room=f'room_{room_id}')
     
     # Emit message to all users in the room
-    emit('new_message', message.to_dict(), room=f'room_{room_id}')
+    message_data = message.to_dict()
+    state = shard_router.get(room_id)
+    if state is not None:
+        state.add_message(message_data)
+    emit('new_message', message_data, room=f'room_{room_id}')
+    
+    # Members elsewhere bump their unread count, the sender has read it
+    mark_read(current_user.id, room_id, message.id)
+    emit('unread_increment', {
+        'room_id': room_id,
+        'message_id': message.id,
+        'user_id': current_user.id
+    }, room=f'unread_{room_id}')
     
     print(f"Message sent by {current_user.username} in room {room.name}")
 
+@socketio.on('mark_read')
+def on_mark_read(data):
+    """Record that the user has read a room up to a message"""
+    if not current_user.is_authenticated:
+        return
+    
+    room_id = data.get('room_id')
+    message_id = data.get('message_id')
+    if not isinstance(room_id, int) or not isinstance(message_id, int):
+        return
+    
+    # Only members move their marker, and only to a message of that room
+    readable = (db.session.query(Message.id)
+                .join(user_rooms, db.and_(user_rooms.c.room_id == Message.room_id,
+                                          user_rooms.c.user_id == current_user.id))
+                .filter(Message.id == message_id, Message.room_id == room_id)
+                .first())
+    if readable is None:
+        return
+    
+    # Buffered and written to user_rooms in batches
+    mark_read(current_user.id, room_id, message_id)
+    emit('unread_reset', {'room_id': room_id, 'message_id': message_id})
+
+@socketio.on('sync')
+def on_sync(data):
+    """Send the rooms, memberships and users changed since the client's version"""
+    if not current_user.is_authenticated:
+        return
+    
+    since = data.get('since') if isinstance(data, dict) else None
+    if since is not None and not isinstance(since, int):
+        emit('error', {'message': 'Invalid sync version'})
+        return
+    
+    emit('sync', changes_since(since, current_user, current_app.config['SYNC_PAGE_SIZE']))
+
 @socketio.on('typing_start')
+@rate_limited('typing_start')
 def on_typing_start(data):
     """Handle user starting to type"""
     if not current_user.is_authenticated:
         return
     
     room_id = data.get('room_id')
-    if not room_id:
+    if not room_id or redirect_to_owner(room_id):
         return
     
     # Add user to typing list for this room
@@ -240,6 +396,7 @@ def on_typing_stop(data):
     }, room=f'room_{room_id}')
 
 @socketio.on('edit_message')
+@rate_limited('edit_message')
 def on_edit_message(data):
     """Handle message editing"""
     if not current_user.is_authenticated:
@@ -262,15 +419,37 @@ def on_edit_message(data):
         emit('error', {'message': 'Permission denied'})
         return
     
+    if redirect_to_owner(message.room_id):
+        return
+    
     # Sanitize new content
     new_content = sanitize_input(new_content)
+    if new_content == message.content:
+        return
     
-    # Edit the message
-    message.edit(new_content)
+    # Edit the message, keeping the previous content as a delta
+    delta = edit_message(message, new_content, current_user.id)
     db.session.commit()
-    
-    # Emit updated message to all users in the room
-    emit('message_edited', message.to_dict(), room=f'room_{message.room_id}')
+    bump(f'room:{message.room_id}')
+    
+    # Clients holding base_revision apply the delta, others fetch the message
+    edited = {
+        'id': message.id,
+        'room_id': message.room_id,
+        'revision': message.revision,
+        'base_revision': message.revision - 1,
+        'updated_at': message.updated_at.isoformat(),
+        'is_edited': True
+    }
+    encoded = encode(delta)
+    if len(encoded) < len(new_content):
+        edited['delta'] = delta
+    else:
+        edited['content'] = new_content
+    state = shard_router.get(message.room_id)
+    if state is not None:
+        state.update_message(message.to_dict())
+    emit('message_edited', edited, room=f'room_{message.room_id}')
 
 @socketio.on('delete_message')
 def on_delete_message(data):
@@ -293,9 +472,18 @@ def on_delete_message(data):
         emit('error', {'message': 'Permission denied'})
         return
     
-    # Soft delete the message
+    if redirect_to_owner(message.room_id):
+        return
+    
+    # Soft delete the message, its edit history goes with the content
     message.soft_delete()
+    drop_history([message.id])
     db.session.commit()
+    bump(f'room:{message.room_id}')
+    
+    state = shard_router.get(message.room_id)
+    if state is not None:
+        state.update_message(message.to_dict())
     
     # Emit deleted message to all users in the room
     emit('message_deleted', {'message_id': message_id}, room=f'room_{message.room_id}')
@@ -314,13 +502,25 @@ def on_get_online_users(data):
     if not room:
         return
     
-    # Get online users in this room
+    # Check if user has access to this room
+    if room.is_private and not room.is_member(current_user):
+        emit('error', {'message': 'Access denied to this room'})
+        return
+    
+    page = max(int_arg(data, 'page', 1), 1)
+    per_page = min(max(int_arg(data, 'per_page', 50), 1), 100)
+    
+    # Get one page of online users in this room
+    online = online_members(room_id, page, per_page)
     online_users = [
         {'id': user.id, 'username': user.username, 'avatar': user.avatar}
-        for user in room.members if user.is_online
+        for user in online.items
     ]
     
     emit('online_users_list', {
         'room_id': room_id,
-        'users': online_users
+        'users': online_users,
+        'total': online.total,
+        'page': online.page,
+        'pages': online.pages
     })
\ No newline at end of file
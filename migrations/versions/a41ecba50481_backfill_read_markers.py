@@ -0,0 +1,29 @@
+"""Backfill read markers
+
+Revision ID: a41ecba50481
+Revises: a1c90493a1b0
+Create Date: 2026-10-19 02:00:23.915866
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41ecba50481'
+down_revision = 'a1c90493a1b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Members who never marked a room read had every message counted as unread
+    op.execute(
+        'UPDATE user_rooms SET last_read_message_id = '
+        '(SELECT max(messages.id) FROM messages WHERE messages.room_id = user_rooms.room_id) '
+        'WHERE last_read_message_id IS NULL'
+    )
+
+
+def downgrade():
+    # The markers stay valid, there is nothing to undo
+    pass
@@ -0,0 +1,32 @@
+"""Never reuse message ids
+
+Revision ID: fbbc9af77451
+Revises: 1bf8b85e1572
+Create Date: 2026-10-19 02:14:02.204981
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'fbbc9af77451'
+down_revision = '1bf8b85e1572'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite hands out max(rowid) + 1 unless the table is AUTOINCREMENT, so
+    # archiving the newest messages would let new ones reuse archived ids.
+    # Other databases use sequences that never go back.
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('messages', recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('messages', recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': False}):
+            pass
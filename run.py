@@ -3,9 +3,12 @@ import os
 
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
-from app import create_app, socketio
+from app import create_app, start_workers, socketio
 
 app = create_app()
 
 if __name__ == '__main__':
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+    # Background workers run in the server only, not in flask CLI commands importing this app
+    start_workers(app)
+    port = int(os.environ.get('PORT', 5000))
+    socketio.run(app, debug=True, host='0.0.0.0', port=port)
@@ -0,0 +1,10 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from app import create_app, start_workers
+
+# Entrypoint for WSGI servers: gunicorn --worker-class eventlet -w 1 wsgi:app
+app = create_app()
+start_workers(app)